@@ -1,4 +1,5 @@
 import streamlit as st
+import threading
 import time
 import yaml
 from pathlib import Path
@@ -7,6 +8,7 @@ import requests
 from src.search import SearchEngine
 from src.styles import get_css, result_card_html
 from src.qa_engine import MistralQAEngine
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Page Config
 st.set_page_config(
@@ -48,19 +50,74 @@ def ollama_base_url(model_url: str) -> str:
 
 config = load_config()
 
-# Initialize Session State Engines
-if 'engine' not in st.session_state:
-    with st.spinner("Initializing Semantic Search Engine..."):
-        st.session_state.engine = SearchEngine(DATA_DIR, config=config)
+# Engines are process-wide: every browser session shares one model, one index
+# and one set of caches. Searches run concurrently; SearchEngine serializes
+# ingestion, and a file ingested in one session is searchable in all of them.
+@st.cache_resource(show_spinner="Initializing Semantic Search Engine...")
+def get_search_engine() -> SearchEngine:
+    return SearchEngine(DATA_DIR, config=config)
 
-if 'qa_engine' not in st.session_state:
+@st.cache_resource
+def get_qa_engine() -> MistralQAEngine:
     summa_cfg = config.get('summarization', {})
-    st.session_state.qa_engine = MistralQAEngine(
+    return MistralQAEngine(
         model_url=summa_cfg.get('model_url', "http://localhost:11434/api/generate"),
         model_name=summa_cfg.get('model_name', 'mistral'),
         timeout=summa_cfg.get('timeout', 120),
     )
 
+class SessionTracker:
+    """
+    Browser sessions seen within `window` seconds, for the memory report.
+    Bounded: expired sessions are pruned on every update and at most
+    `max_sessions` (the most recently seen) are kept.
+    """
+
+    def __init__(self, window: float = 1800.0, max_sessions: int = 10000):
+        self.window = window
+        self.max_sessions = max_sessions
+        # session id -> last seen, least recently seen first
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        cutoff = now - self.window
+        while self._seen:
+            oldest = next(iter(self._seen))
+            if self._seen[oldest] >= cutoff and len(self._seen) <= self.max_sessions:
+                break
+            del self._seen[oldest]
+
+    def touch(self):
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            now = time.monotonic()
+            with self._lock:
+                self._seen.pop(ctx.session_id, None)
+                self._seen[ctx.session_id] = now
+                self._prune(now)
+
+    def active(self) -> int:
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._seen)
+
+@st.cache_resource
+def get_session_tracker() -> SessionTracker:
+    return SessionTracker()
+
+def format_bytes(n) -> str:
+    if n is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+engine = get_search_engine()
+qa_engine = get_qa_engine()
+get_session_tracker().touch()
+
 if "chat_messages" not in st.session_state:
     st.session_state.chat_messages = [
         {"role": "assistant", "content": "Hello! I am your AI assistant. Ask me anything about the university policies, schedules, or notices.", "sources": []}
@@ -105,7 +162,7 @@ with st.sidebar:
                 progress_bar.progress((i + 1) / len(uploaded_files))
             
             with st.spinner("Processing documents into vector space..."):
-                st.session_state.engine.ingest_new_files()
+                engine.ingest_new_files()
             st.success(f"Successfully processed {len(uploaded_files)} files!")
 
     st.markdown("---")
@@ -129,7 +186,7 @@ with tab_search:
         with st.spinner("Searching vector space..."):
             start_time = time.time()
             filters = {'categories': category_filter} if category_filter else None
-            results = st.session_state.engine.search(query, k=config['search']['top_k'], filters=filters)
+            results = engine.search(query, k=config['search']['top_k'], filters=filters)
             end_time = time.time()
             
         st.caption(f"⚡ Found **{len(results)}** results in **{end_time - start_time:.3f}s**")
@@ -182,7 +239,7 @@ with tab_qa:
                 response_placeholder.markdown("🔍 _Scanning documents..._")
                 
                 # Fetch relevant docs
-                search_results = st.session_state.engine.search(prompt, k=5)
+                search_results = engine.search(prompt, k=5)
                 context_docs = []
                 for res in search_results:
                     context_docs.append({
@@ -197,7 +254,7 @@ with tab_qa:
                     st.session_state.chat_messages.append({"role": "assistant", "content": reply})
                 else:
                     response_placeholder.markdown("🧠 _Synthesizing response..._")
-                    qa_result = st.session_state.qa_engine.answer_question(prompt, context_docs)
+                    qa_result = qa_engine.answer_question(prompt, context_docs)
                     
                     answer = qa_result['answer']
                     sources = qa_result.get('sources', [])
@@ -220,7 +277,7 @@ with tab_dashboard:
     
     col1, col2, col3, col4 = st.columns(4)
     total_docs = len(list(RAW_DIR.glob("*")))
-    total_vectors = st.session_state.engine.indexer.index.ntotal if hasattr(st.session_state.engine.indexer, 'index') else 0
+    total_vectors = engine.indexer.index.ntotal if engine.indexer.index is not None else 0
     
     with col1:
         st.markdown(f"""
@@ -255,6 +312,24 @@ with tab_dashboard:
         </div>
         """, unsafe_allow_html=True)
 
+    st.markdown("### 🧠 Memory")
+    memory = engine.memory_report()
+    sessions = get_session_tracker().active()
+    shared = memory["model"] + memory["index"]["bytes"]
+    mem1, mem2, mem3, mem4 = st.columns(4)
+    mem1.metric("Process RSS", format_bytes(memory["process_rss"]))
+    mem2.metric("Embedding model", format_bytes(memory["model"]))
+    mem3.metric(
+        "Vector index",
+        format_bytes(memory["index"]["bytes"]),
+        help="Memory-mapped: pages are shared with other processes" if memory["index"]["mapped"] else None,
+    )
+    mem4.metric("Active sessions (30 min)", sessions)
+    st.caption(
+        f"One engine (embedding model + vector index: {format_bytes(shared)}) is shared by "
+        f"all {sessions} session(s)."
+    )
+
     st.markdown("### 📜 System Logs")
     log_file = LOG_DIR / "app.log"
     if log_file.exists():
@@ -276,9 +351,21 @@ with tab_scraper:
                 with st.spinner("Spider initiating operations..."):
                     try:
                         from src.scraper import NoticesCrawler
+                        from src.pipeline import CrawlDownloads
                         crawler = NoticesCrawler()
-                        downloaded = crawler.crawl(limit=config['scraping']['download_limit'])
-                        st.success(f"Download sequence complete. Acquired {downloaded} new notices.")
+                        # Downloads are indexed here; a URL is confirmed only once its file is
+                        downloads = CrawlDownloads(get_search_engine(), crawler)
+                        try:
+                            result = crawler.crawl(
+                                limit=config['scraping']['download_limit'],
+                                on_file_saved=downloads.submit,
+                            )
+                        finally:
+                            indexed = downloads.close()
+                        st.success(
+                            f"Download sequence complete. Acquired {result['files_downloaded']} new notices, "
+                            f"indexed {len(indexed)}."
+                        )
                         st.balloons()
                         time.sleep(2)
                         st.rerun()
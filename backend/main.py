@@ -5,14 +5,16 @@ Exposes search, Q&A, ingestion, analytics, and dynamic web crawling endpoints.
 
 import sys
 import os
+import asyncio
 import logging
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 
 import yaml
-import requests as http_requests
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
@@ -21,7 +23,7 @@ from pydantic import BaseModel, HttpUrl
 BASE_DIR = Path(__file__).parent.parent.absolute()
 sys.path.insert(0, str(BASE_DIR))
 
-from src.search import SearchEngine
+from src.search import SearchEngine, QueryBatcher
 from src.qa_engine import MistralQAEngine
 
 # ─── Logging ─────────────────────────────────────────────────────────────────
@@ -47,6 +49,8 @@ def load_config() -> dict:
     return cfg
 
 CONFIG = load_config()
+API_CFG = CONFIG.get("api", {}) or {}
+SCRAPING_CFG = CONFIG.get("scraping", {}) or {}
 
 # ─── Directories ──────────────────────────────────────────────────────────────
 DATA_DIR   = BASE_DIR / "data"
@@ -59,6 +63,7 @@ for d in [RAW_DIR, WATCH_DIR, LOG_DIR, DATA_DIR / "metadata", DATA_DIR / "index"
 
 # ─── Engines (lazy-init to avoid blocking startup) ────────────────────────────
 _search_engine: Optional[SearchEngine] = None
+_query_batcher: Optional[QueryBatcher] = None
 _qa_engine: Optional[MistralQAEngine] = None
 _engine_lock = threading.Lock()
 
@@ -71,6 +76,20 @@ def get_search_engine() -> SearchEngine:
                 _search_engine = SearchEngine(DATA_DIR, config=CONFIG)
     return _search_engine
 
+def get_query_batcher() -> QueryBatcher:
+    global _query_batcher
+    if _query_batcher is None:
+        engine = get_search_engine()
+        with _engine_lock:
+            if _query_batcher is None:
+                search_cfg = CONFIG.get("search", {})
+                _query_batcher = QueryBatcher(
+                    engine,
+                    window_ms=search_cfg.get("batch_window_ms", 3),
+                    max_batch=search_cfg.get("max_query_batch", 32),
+                )
+    return _query_batcher
+
 def get_qa_engine() -> MistralQAEngine:
     global _qa_engine
     if _qa_engine is None:
@@ -79,9 +98,34 @@ def get_qa_engine() -> MistralQAEngine:
             model_url=summa.get("model_url", "http://127.0.0.1:11434/api/generate"),
             model_name=summa.get("model_name", "mistral"),
             timeout=summa.get("timeout", 120),
+            max_connections=API_CFG.get("ollama_max_connections", 4),
         )
     return _qa_engine
 
+# ─── Worker pool ──────────────────────────────────────────────────────────────
+# Embedding, FAISS and OCR work is blocking; it runs on this bounded pool so the
+# event loop keeps serving other clients. Threads rather than processes: the
+# model and index live in this process, and torch / faiss release the GIL.
+_executor = ThreadPoolExecutor(
+    max_workers=API_CFG.get("worker_threads", 8), thread_name_prefix="api-worker"
+)
+
+# Per-endpoint caps on in-flight requests; excess requests wait their turn
+_DEFAULT_CONCURRENCY = {"search": 16, "qa": 2, "ingest": 1, "stats": 4}
+_endpoint_limits: Dict[str, asyncio.Semaphore] = {}
+
+def _endpoint_limit(endpoint: str) -> asyncio.Semaphore:
+    sem = _endpoint_limits.get(endpoint)
+    if sem is None:
+        limits = {**_DEFAULT_CONCURRENCY, **(API_CFG.get("concurrency") or {})}
+        sem = _endpoint_limits[endpoint] = asyncio.Semaphore(limits.get(endpoint, 4))
+    return sem
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """Run a blocking call on the worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
 # ─── App ──────────────────────────────────────────────────────────────────────
 app = FastAPI(
     title="Digital Archaeology API",
@@ -89,6 +133,12 @@ app = FastAPI(
     description="Semantic document search and AI Q&A for university archives.",
 )
 
+@app.on_event("shutdown")
+async def _shutdown():
+    if _qa_engine is not None:
+        await _qa_engine.aclose()
+    _executor.shutdown(wait=False)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -98,33 +148,58 @@ app.add_middleware(
 )
 
 # ─── Pydantic models ──────────────────────────────────────────────────────────
-class SearchRequest(BaseModel):
-    query: str
+class SearchFilters(BaseModel):
     categories: Optional[List[str]] = []
+    types: Optional[List[str]] = []      # summary / chunk / web_chunk
+    domains: Optional[List[str]] = []
+    date_from: Optional[str] = None      # ISO-8601 ingest date bounds
+    date_to: Optional[str] = None
     k: Optional[int] = 5
 
+    def filters(self) -> Optional[Dict[str, Any]]:
+        filters = {
+            "categories": self.categories,
+            "type": self.types,
+            "domain": self.domains,
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+        }
+        filters = {key: value for key, value in filters.items() if value}
+        return filters or None
+
+class SearchRequest(SearchFilters):
+    query: str
+
+class BatchSearchRequest(SearchFilters):
+    queries: List[str]
+
 class QARequest(BaseModel):
     question: str
     k: Optional[int] = 5
 
 class CrawlRequest(BaseModel):
-    urls: List[str]              # One or more seed URLs
+    urls: List[str] = []         # One or more seed URLs (optional when resuming)
     max_pages: Optional[int] = 25
     max_depth: Optional[int] = 2
     same_domain_only: Optional[bool] = True
     index_immediately: Optional[bool] = True  # Auto-index scraped pages
+    resume: Optional[bool] = False  # Continue the last stopped / unfinished crawl
 
 # ─── In-memory crawl status ───────────────────────────────────────────────────
 _crawl_status: Dict[str, Any] = {
     "running": False,
     "pages_scraped": 0,
+    "pages_unchanged": 0,
     "files_downloaded": 0,
     "indexed": 0,
+    "pending": 0,
     "errors": [],
     "log": [],
     "started_at": None,
     "finished_at": None,
 }
+# Set by /api/crawl/stop; the crawler checks it between requests
+_crawl_stop = threading.Event()
 
 def _crawl_log(msg: str):
     timestamp = time.strftime("%H:%M:%S")
@@ -139,8 +214,10 @@ def _run_crawl_job(req: CrawlRequest):
     _crawl_status.update({
         "running": True,
         "pages_scraped": 0,
+        "pages_unchanged": 0,
         "files_downloaded": 0,
         "indexed": 0,
+        "pending": 0,
         "errors": [],
         "log": [],
         "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
@@ -149,21 +226,60 @@ def _run_crawl_job(req: CrawlRequest):
 
     try:
         from src.scraper import WebCrawler
-        from src.embeddings import EmbeddingGenerator
-        from src.indexer import FaissIndexer
         from src.classifier import NoticeClassifier
+        from src.pipeline import ChunkBatcher, CrawlDownloads
+        from src.chunker import TextChunker
         from src.utils import clean_text
 
-        embedder = EmbeddingGenerator(CONFIG["search"].get("model_name", "all-MiniLM-L6-v2"))
-        indexer = FaissIndexer(DATA_DIR / "index")
+        # Write through the search engine's own indexer so crawled pages are
+        # searchable immediately, without a reload from disk.
+        engine = get_search_engine()
         classifier = NoticeClassifier()
+        chunker = TextChunker.from_config(
+            CONFIG,
+            tokenizer=engine.embedder.tokenizer,
+            model_max_tokens=engine.embedder.max_seq_length,
+        )
+
+        # source_url -> chunks of the page not indexed yet; a page is confirmed
+        # to the crawler (its new state recorded) once all of them are
+        unindexed_chunks: Dict[str, int] = {}
+        unindexed_lock = threading.Lock()
+
+        def on_chunks_indexed(metadatas: List[Dict]):
+            _crawl_status["indexed"] += len(metadatas)
+            pages = {m["source_url"] for m in metadatas}
+            _crawl_log(f"Indexed {len(metadatas)} chunks from {len(pages)} page(s)")
+            completed = []
+            with unindexed_lock:
+                for m in metadatas:
+                    unindexed_chunks[m["source_url"]] -= 1
+                for url in pages:
+                    if unindexed_chunks[url] <= 0:
+                        del unindexed_chunks[url]
+                        completed.append(url)
+            for url in completed:
+                crawler.confirm(url)
+
+        # Chunks from many pages share one encode call and one index append;
+        # none waits longer than index_max_latency seconds
+        chunk_batcher = ChunkBatcher(
+            engine.embedder,
+            engine.indexer,
+            batch_size=int(SCRAPING_CFG.get("index_batch_size", 128)),
+            max_latency=float(SCRAPING_CFG.get("index_max_latency", 2.0)),
+            on_indexed=on_chunks_indexed,
+        )
 
         def on_page_saved(page_data: dict):
             """Index each scraped page immediately."""
             if not req.index_immediately:
                 return
+            # The page changed: whatever was indexed from it before is stale
+            engine.indexer.remove_source_url(page_data["source_url"])
             full_text = page_data.get("full_text", "").strip()
             if not full_text or len(full_text) < 100:
+                crawler.confirm(page_data["source_url"])
                 return
 
             title = page_data.get("title", "Scraped Page")
@@ -196,26 +312,29 @@ def _run_crawl_job(req: CrawlRequest):
             }
 
             # Chunk and index
-            chunks = [cleaned[i:i+500] for i in range(0, min(len(cleaned), 3000), 400)]
+            chunks = [c["text"] for c in chunker.chunk(cleaned)]
             if not chunks:
+                crawler.confirm(page_data["source_url"])
                 return
 
+            texts, metadatas = [], []
             for i, chunk in enumerate(chunks):
-                if len(chunk.strip()) < 50:
+                if len(chunk) < 50:
                     continue
-                emb = embedder.generate(chunk)
-                if len(emb.shape) == 1:
-                    emb = emb.reshape(1, -1)
                 chunk_meta = meta.copy()
                 chunk_meta["type"] = "web_chunk"
                 chunk_meta["id"] = f"{page_data['source_url']}_chunk_{i}"
                 chunk_meta["content_snippet"] = chunk[:400]
-                indexer.add_single_document(emb[0], chunk_meta)
-                _crawl_status["indexed"] += 1
-
-            _crawl_log(f"Indexed: {title[:60]!r} (+{len(chunks)} chunks)")
+                texts.append(chunk)
+                metadatas.append(chunk_meta)
+            if not texts:
+                crawler.confirm(page_data["source_url"])
+                return
+            with unindexed_lock:
+                unindexed_chunks[page_data["source_url"]] = len(texts)
+            chunk_batcher.add(texts, metadatas)
 
-        _crawl_log(f"Starting crawl of {req.urls}")
+        _crawl_log("Resuming last crawl" if req.resume else f"Starting crawl of {req.urls}")
         crawler = WebCrawler(
             download_dir=WATCH_DIR,
             data_dir=DATA_DIR,
@@ -223,38 +342,43 @@ def _run_crawl_job(req: CrawlRequest):
             timeout=12,
             retry_count=2,
             same_domain_only=req.same_domain_only,
+            max_workers=SCRAPING_CFG.get("max_workers", 8),
+            per_host_concurrency=SCRAPING_CFG.get("per_host_concurrency", 2),
+            max_download_bytes=int(SCRAPING_CFG.get("max_download_mb", 64) * 1024 * 1024),
         )
 
-        result = crawler.crawl(
-            start_urls=req.urls,
-            max_pages=req.max_pages,
-            max_depth=req.max_depth,
-            download_files=True,
-            on_page_saved=on_page_saved,
-        )
+        # Downloaded PDFs/images go straight into the ingestion pipeline, so
+        # they are searchable while the crawl is still running
+        downloads = CrawlDownloads(engine, crawler)
+
+        try:
+            result = crawler.crawl(
+                start_urls=req.urls,
+                max_pages=req.max_pages,
+                max_depth=req.max_depth,
+                download_files=True,
+                on_page_saved=on_page_saved,
+                on_file_saved=downloads.submit,
+                resume=req.resume,
+                stop_event=_crawl_stop,
+            )
+        finally:
+            # Let pages and binaries already handed over finish indexing
+            chunk_batcher.close()
+            binary_indexed = downloads.close()
 
         _crawl_status["pages_scraped"] = result["pages_scraped"]
+        _crawl_status["pages_unchanged"] = result["pages_unchanged"]
+        _crawl_status["pending"] = result["pending"]
         _crawl_status["files_downloaded"] = result["files_downloaded"]
+        if binary_indexed:
+            _crawl_log(f"Indexed {len(binary_indexed)} binary files.")
 
-        # Also ingest any downloaded PDFs/images
-        if result["files_downloaded"] > 0:
-            _crawl_log("Processing downloaded binary files...")
-            try:
-                engine = get_search_engine()
-                new_files = engine.ingest_new_files()
-                _crawl_log(f"Indexed {len(new_files)} binary files.")
-            except Exception as e:
-                _crawl_status["errors"].append(f"Binary ingest error: {e}")
-
-        # Reload the search engine's indexer so new data is immediately searchable
-        try:
-            engine = get_search_engine()
-            engine.indexer._load_or_create_index()
-            _crawl_log("Search index refreshed.")
-        except Exception as e:
-            _crawl_status["errors"].append(f"Index refresh error: {e}")
-
-        _crawl_log(f"Done. pages={result['pages_scraped']}, files={result['files_downloaded']}, indexed={_crawl_status['indexed']}")
+        _crawl_log(
+            f"{'Stopped' if result['stopped'] else 'Done'}. pages={result['pages_scraped']}, "
+            f"unchanged={result['pages_unchanged']}, files={result['files_downloaded']}, "
+            f"indexed={_crawl_status['indexed']}, pending={result['pending']}"
+        )
 
     except Exception as e:
         _crawl_status["errors"].append(str(e))
@@ -274,32 +398,38 @@ async def root():
 async def health():
     return {"status": "ok", "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
 
+def _index_stats() -> Dict[str, Any]:
+    engine = get_search_engine()
+    return {
+        "total_vectors": engine.indexer.index.ntotal if engine.indexer.index else 0,
+        "index_type": engine.indexer.active_index_type,
+        "compression": engine.indexer.active_compression,
+        "cache": engine.cache_stats(),
+        "total_docs": len(list(RAW_DIR.glob("*"))) + len(list(WATCH_DIR.glob("*"))),
+    }
+
 @app.get("/api/stats")
 async def get_stats():
-    try:
-        engine = get_search_engine()
-        total_vectors = engine.indexer.index.ntotal if engine.indexer.index else 0
-        total_docs = len(list(RAW_DIR.glob("*"))) + len(list(WATCH_DIR.glob("*")))
-    except Exception:
-        total_vectors = 0
-        total_docs = 0
+    async with _endpoint_limit("stats"):
+        try:
+            stats = await run_blocking(_index_stats)
+        except Exception:
+            stats = {"total_vectors": 0, "index_type": None, "compression": None, "cache": None, "total_docs": 0}
 
     # Check Ollama
-    summa = CONFIG.get("summarization", {})
-    model_name = summa.get("model_name", "mistral")
+    model_name = CONFIG.get("summarization", {}).get("model_name", "mistral")
     ollama_ok = False
     try:
-        base = summa.get("model_url", "http://127.0.0.1:11434/api/generate")
-        base = base.split("/api/")[0]
-        resp = http_requests.get(f"{base}/api/tags", timeout=2)
-        tags = resp.json().get("models", [])
-        ollama_ok = any(m.get("name") == model_name for m in tags)
+        ollama_ok = model_name in await get_qa_engine().list_models_async(timeout=2)
     except Exception:
         pass
 
     return {
-        "total_documents": total_docs,
-        "total_vectors": total_vectors,
+        "total_documents": stats["total_docs"],
+        "total_vectors": stats["total_vectors"],
+        "index_type": stats["index_type"],
+        "compression": stats["compression"],
+        "cache": stats["cache"],
         "llm_model": model_name,
         "llm_available": ollama_ok,
         "status": "online",
@@ -310,28 +440,44 @@ async def search(req: SearchRequest):
     if not req.query or not req.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     try:
-        engine = get_search_engine()
-        filters = {"categories": req.categories} if req.categories else None
-        results = engine.search(req.query, k=req.k or 5, filters=filters)
-
-        # Normalise score field so frontend gets 0..1 similarity (not L2 distance)
-        for r in results:
-            raw = r.get("score", 0)
-            # L2 distance → bounded similarity: sim = 1 / (1 + dist)
-            r["score"] = float(1.0 / (1.0 + raw))
-
+        filters = req.filters()
+        # Each request waits on a pool thread, which lets the batcher coalesce
+        # concurrent requests into one encode + FAISS search.
+        # Scores are similarities (cosine with the "ip" metric), higher is better
+        async with _endpoint_limit("search"):
+            batcher = await run_blocking(get_query_batcher)
+            results = await run_blocking(batcher.search, req.query, k=req.k or 5, filters=filters)
         return {"results": results, "count": len(results)}
     except Exception as e:
         logger.exception("Search failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/search/batch")
+async def search_batch(req: BatchSearchRequest):
+    """Run several queries with one embedding call and one FAISS search."""
+    queries = [q for q in req.queries if q and q.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="Provide at least one non-empty query")
+    try:
+        async with _endpoint_limit("search"):
+            engine = await run_blocking(get_search_engine)
+            results = await run_blocking(engine.search_many, queries, k=req.k or 5, filters=req.filters())
+        return {
+            "results": [{"query": q, "results": r, "count": len(r)} for q, r in zip(queries, results)],
+            "count": len(queries),
+        }
+    except Exception as e:
+        logger.exception("Batch search failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/qa")
 async def ask_question(req: QARequest):
     if not req.question or not req.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     try:
-        engine = get_search_engine()
-        search_results = engine.search(req.question, k=req.k or 5)
+        async with _endpoint_limit("search"):
+            engine = await run_blocking(get_search_engine)
+            search_results = await run_blocking(engine.search, req.question, k=req.k or 5)
         context_docs = [
             {
                 "filename": r.get("filename", "Unknown"),
@@ -345,8 +491,10 @@ async def ask_question(req: QARequest):
         if not context_docs:
             return {"answer": "No relevant documents found in the archive for your question.", "sources": []}
 
-        qa = get_qa_engine()
-        result = qa.answer_question(req.question, context_docs)
+        # Generation can take minutes; it is awaited on the async client, so it
+        # holds no worker thread while Ollama runs.
+        async with _endpoint_limit("qa"):
+            result = await get_qa_engine().answer_question_async(req.question, context_docs)
 
         # Include source URLs if available
         sources_with_url = []
@@ -374,16 +522,18 @@ async def ingest_files(files: List[UploadFile] = File(...)):
         for uf in files:
             dest = RAW_DIR / uf.filename
             content = await uf.read()
-            dest.write_bytes(content)
+            await run_blocking(dest.write_bytes, content)
             saved.append(uf.filename)
             logger.info(f"Saved upload: {uf.filename} ({len(content)/1024:.1f} KB)")
 
-        engine = get_search_engine()
-        new_indexed = engine.ingest_new_files()
+        async with _endpoint_limit("ingest"):
+            engine = await run_blocking(get_search_engine)
+            new_indexed = await run_blocking(engine.ingest_new_files)
         return {
             "message": f"Processed {len(saved)} file(s).",
             "saved_files": saved,
             "indexed": len(new_indexed),
+            "cache": engine.last_ingest_report.get("cache"),
         }
     except Exception as e:
         logger.exception("Ingest failed")
@@ -399,7 +549,7 @@ async def start_crawl(req: CrawlRequest, background_tasks: BackgroundTasks):
     if _crawl_status["running"]:
         raise HTTPException(status_code=409, detail="A crawl is already running. Wait for it to finish.")
 
-    if not req.urls:
+    if not req.urls and not req.resume:
         raise HTTPException(status_code=400, detail="Provide at least one URL to crawl.")
 
     # Validate URLs
@@ -411,6 +561,7 @@ async def start_crawl(req: CrawlRequest, background_tasks: BackgroundTasks):
         valid_urls.append(u)
     req.urls = valid_urls
 
+    _crawl_stop.clear()
     background_tasks.add_task(_run_crawl_job, req)
     return {
         "message": "Crawl started in background.",
@@ -425,8 +576,11 @@ async def crawl_status():
 
 @app.post("/api/crawl/stop")
 async def stop_crawl():
-    """Signal the crawl to stop (best-effort)."""
-    _crawl_status["running"] = False
+    """
+    Stop the running crawl after its in-flight requests finish. The frontier
+    is kept on disk; start again with `resume: true` to continue.
+    """
+    _crawl_stop.set()
     return {"message": "Stop signal sent."}
 
 @app.get("/api/logs")
@@ -445,6 +599,7 @@ async def run_scrape_legacy(background_tasks: BackgroundTasks):
     if not cfg_urls:
         raise HTTPException(status_code=400, detail="No target_urls in config.yaml")
     req = CrawlRequest(urls=cfg_urls, max_pages=CONFIG["scraping"].get("download_limit", 20))
+    _crawl_stop.clear()
     background_tasks.add_task(_run_crawl_job, req)
     return {"message": f"Crawl started for {len(cfg_urls)} configured URL(s)."}
 
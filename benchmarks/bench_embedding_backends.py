@@ -0,0 +1,113 @@
+"""
+Sentences/sec and single-query latency of each `search.embedding_backend`
+(torch, onnx, onnx_int8), and how far the ONNX vectors are from the torch ones:
+max absolute element difference, minimum cosine similarity, and the overlap
+of top-10 neighbours among the benchmark texts.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py [--model NAME] [--models-dir DIR]
+        [--texts N] [--metadata-dir DIR] [--threads N] [--repeat N]
+
+Texts are chunks (`TextChunker`, default window) of the documents in
+data/metadata, i.e. what ingestion actually embeds; when there are fewer
+than --texts of them, synthetic notice-like sentences make up the rest.
+ONNX exports are created in --models-dir on first run and reused afterwards.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.chunker import TextChunker  # noqa: E402
+from src.embeddings import BACKENDS, EmbeddingGenerator  # noqa: E402
+
+SUBJECTS = ("Mid-semester examination", "Hostel fee payment", "Scholarship application",
+            "Convocation ceremony", "Library timing", "Placement drive", "Course registration")
+DETAILS = ("will be held in the main auditorium", "must be completed before the deadline",
+           "has been postponed until further notice", "is open to all final year students",
+           "requires a copy of the previous semester marksheet", "is mandatory for B.Tech and M.Tech students")
+
+def load_texts(metadata_dir: Path, count: int) -> list:
+    texts = []
+    chunker = TextChunker()
+    for record_file in sorted(metadata_dir.glob("*.json")):
+        try:
+            content = json.loads(record_file.read_text()).get("content", "")
+        except (OSError, ValueError):
+            continue
+        texts.extend(chunk["text"] for chunk in chunker.chunk(content))
+        if len(texts) >= count:
+            break
+    rng = np.random.default_rng(0)
+    while len(texts) < count:
+        sentences = [f"{rng.choice(SUBJECTS)} {rng.choice(DETAILS)} on {rng.integers(1, 29)} March."
+                     for _ in range(rng.integers(1, 8))]
+        texts.append(" ".join(sentences))
+    return texts[:count]
+
+def run(embedder: EmbeddingGenerator, texts: list, queries: list, repeat: int) -> dict:
+    embedder.generate(texts[:32])  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        vectors = embedder.generate(texts)
+        best = min(best, time.perf_counter() - started)
+    started = time.perf_counter()
+    for query in queries:
+        embedder.generate(query)
+    return {
+        "vectors": vectors,
+        "rate": len(texts) / best,
+        "query_ms": (time.perf_counter() - started) * 1000 / len(queries),
+        "model_mb": embedder.memory_bytes() / 2**20,
+    }
+
+def top_k(vectors: np.ndarray, k: int = 10) -> np.ndarray:
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="SentenceTransformers model (hub id or path)")
+    parser.add_argument("--models-dir", default="data/models", help="Where ONNX exports are kept")
+    parser.add_argument("--metadata-dir", default="data/metadata")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100, help="Single-text encode calls timed for query latency")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime threads (0 = one per CPU core)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    texts = load_texts(Path(args.metadata_dir), args.texts)
+    queries = [t[:80] for t in texts[:args.queries]]
+    print(f"{len(texts)} texts, {np.mean([len(t) for t in texts]):.0f} characters average")
+
+    rows = {}
+    for backend in BACKENDS:
+        embedder = EmbeddingGenerator(args.model, normalize=True, backend=backend,
+                                      models_dir=Path(args.models_dir), threads=args.threads)
+        rows[backend] = run(embedder, texts, queries, args.repeat)
+        del embedder
+
+    reference = rows["torch"]["vectors"]
+    reference_top = top_k(reference)
+    print(f"\nmodel={args.model} threads={args.threads or 'all'}")
+    print(f"{'backend':<11}{'texts/s':>9}{'speedup':>9}{'query ms':>10}{'model MB':>10}"
+          f"{'max |diff|':>12}{'min cos':>9}{'top-10 overlap':>16}")
+    for backend, row in rows.items():
+        vectors = row["vectors"]
+        overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(top_k(vectors), reference_top)])
+        print(
+            f"{backend:<11}{row['rate']:>9.1f}{row['rate'] / rows['torch']['rate']:>8.2f}x{row['query_ms']:>10.2f}"
+            f"{row['model_mb']:>10.1f}{np.abs(vectors - reference).max():>12.2e}"
+            f"{np.sum(vectors * reference, axis=1).min():>9.5f}{overlap:>16.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
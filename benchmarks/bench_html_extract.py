@@ -0,0 +1,161 @@
+"""
+Pages/sec of the crawler's HTML extraction: the single-pass lxml extractor
+(`src.scraper.extract_page_data`) against the previous BeautifulSoup
+implementation, plus a field-by-field parity check.
+
+Usage:
+    python benchmarks/bench_html_extract.py [--html-dir DIR] [--pages-dir DIR] [--repeat N]
+
+Page records in data/crawled_pages hold extracted fields, not the original
+HTML, so by default each record is rebuilt into an HTML page (head, nav,
+headings, paragraphs, links, footer). Point --html-dir at saved .html files
+to benchmark real markup instead.
+"""
+import argparse
+import html
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.scraper import extract_page_data  # noqa: E402
+
+COMPARED_FIELDS = ("title", "description", "headings", "paragraphs", "full_text", "keywords", "links")
+
+def legacy_extract(url: str, content: bytes) -> dict:
+    """The BeautifulSoup extractor this benchmark compares against (returns every date found)."""
+    soup = BeautifulSoup(content, 'lxml')
+    for tag in soup(['nav', 'footer', 'script', 'style', 'header', 'aside']):
+        tag.decompose()
+
+    title = (soup.find('title') or soup.find('h1') or soup.find('h2'))
+    title_text = title.get_text(strip=True) if title else urlparse(url).path
+
+    meta_desc = ''
+    meta = soup.find('meta', attrs={'name': 'description'})
+    if meta:
+        meta_desc = meta.get('content', '')
+
+    headings = []
+    for tag in soup.find_all(['h1', 'h2', 'h3', 'h4']):
+        txt = tag.get_text(strip=True)
+        if txt and len(txt) > 3:
+            headings.append({'level': tag.name, 'text': txt})
+
+    paragraphs = []
+    for p in soup.find_all('p'):
+        txt = p.get_text(strip=True)
+        if txt and len(txt) > 30:
+            paragraphs.append(txt)
+
+    full_text = ' '.join(soup.stripped_strings)
+    full_text = re.sub(r'\s+', ' ', full_text).strip()
+
+    date_pattern = re.compile(
+        r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|'
+        r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{1,2},?\s+\d{4})\b',
+        re.IGNORECASE
+    )
+    dates = sorted(set(date_pattern.findall(full_text)))
+
+    stop_words = {'the','a','an','and','or','of','to','in','is','it','be','are','was','for',
+                 'this','that','with','from','have','has','at','by','on','as','but','not'}
+    words = re.findall(r'\b[a-zA-Z]{4,}\b', full_text.lower())
+    freq = {}
+    for w in words:
+        if w not in stop_words:
+            freq[w] = freq.get(w, 0) + 1
+    keywords = sorted(freq, key=lambda x: -freq[x])[:20]
+
+    links_out = []
+    for a in soup.find_all('a', href=True):
+        href = urljoin(url, a['href'])
+        text = a.get_text(strip=True)
+        links_out.append({'url': href, 'text': text[:100]})
+
+    return {
+        'title': title_text[:200],
+        'description': meta_desc[:500],
+        'headings': headings[:20],
+        'paragraphs': paragraphs[:30],
+        'dates_found': dates,
+        'keywords': keywords,
+        'full_text': full_text[:8000],
+        'links': links_out[:50],
+    }
+
+def page_from_record(record: dict) -> bytes:
+    """Rebuilds an HTML page from a crawled page record."""
+    esc = html.escape
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{esc(record.get('title', ''))}</title>",
+        f"<meta name='description' content='{esc(record.get('description', ''), quote=True)}'>",
+        "<script>var tracking = {enabled: true};</script><style>body{margin:0}</style>",
+        "</head><body><header><a href='/'>Home</a><nav><ul>",
+        *(f"<li><a href='/section/{i}'>Section {i}</a></li>" for i in range(12)),
+        "</ul></nav></header><main>",
+    ]
+    for heading in record.get("headings", []):
+        parts.append(f"<{heading['level']}>{esc(heading['text'])}</{heading['level']}>")
+    for paragraph in record.get("paragraphs", []):
+        parts.append(f"<div class='notice'><p>{esc(paragraph)}</p></div>")
+    parts.append("<ul>")
+    for link in record.get("links", []):
+        parts.append(f"<li><a href='{esc(link['url'], quote=True)}'>{esc(link['text'])}</a></li>")
+    parts.append("</ul></main><aside>Related</aside><footer>&copy; University</footer></body></html>")
+    return "".join(parts).encode("utf-8")
+
+def load_pages(args):
+    if args.html_dir:
+        files = sorted(Path(args.html_dir).glob("*.htm*"))
+        return [(f"https://example.edu/{f.name}", f.read_bytes()) for f in files]
+    pages = []
+    for record_file in sorted(Path(args.pages_dir).glob("page_*.json")):
+        record = json.loads(record_file.read_text())
+        pages.append((record.get("source_url", "https://example.edu/"), page_from_record(record)))
+    return pages
+
+def bench(fn, pages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, content in pages:
+            fn(url, content)
+    return len(pages) * repeat / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html-dir", help="Directory of saved .html pages")
+    parser.add_argument("--pages-dir", default="data/crawled_pages", help="Crawled page records (page_*.json)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    if not pages:
+        sys.exit("No pages found; crawl something first or pass --html-dir.")
+    print(f"{len(pages)} pages, {sum(len(c) for _, c in pages) / len(pages) / 1024:.1f} KiB average")
+
+    mismatches = {}
+    for url, content in pages:
+        old, new = legacy_extract(url, content), extract_page_data(url, content)
+        for field in COMPARED_FIELDS:
+            if old[field] != new[field]:
+                mismatches[field] = mismatches.get(field, 0) + 1
+        # The old extractor kept an arbitrary 10 of the dates (set order); the new one the first 10
+        dates = set(new["dates_found"])
+        if not dates <= set(old["dates_found"]) or len(dates) != min(10, len(old["dates_found"])):
+            mismatches["dates_found"] = mismatches.get("dates_found", 0) + 1
+    print("parity:", "identical output" if not mismatches else f"fields differing (pages): {mismatches}")
+
+    legacy_rate = bench(legacy_extract, pages, args.repeat)
+    new_rate = bench(extract_page_data, pages, args.repeat)
+    print(f"BeautifulSoup: {legacy_rate:8.1f} pages/s")
+    print(f"lxml one-pass: {new_rate:8.1f} pages/s  ({new_rate / legacy_rate:.1f}x)")
+
+if __name__ == "__main__":
+    main()
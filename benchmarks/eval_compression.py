@@ -0,0 +1,173 @@
+"""
+Memory and recall@10 of each `search.compression` mode, measured through
+`FaissIndexer` itself (training, migration and re-ranking included) against
+exact float32 search.
+
+Usage:
+    python benchmarks/eval_compression.py [--index-dir DIR | --synthetic N]
+        [--queries N] [--index-type flat|hnsw|ivf_flat] [--metric ip|l2]
+        [--rerank-factor N] [--pq-m M]
+
+By default the vectors of the existing index (data/index/faiss_index.bin) are
+used when it holds enough of them to train PQ; otherwise, or with
+--synthetic, clustered random vectors stand in for chunk embeddings. Queries
+are held-out vectors with a little noise added. "index MB / 1M" is the
+serialized index size scaled to a million vectors, i.e. the resident memory
+of the index; re-ranking modes also keep a float32 copy on disk (mmap).
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.indexer import FaissIndexer  # noqa: E402
+
+MODES = (
+    # (label, compression, rerank_factor or None for --rerank-factor)
+    ("float32", "none", 0),
+    ("fp16", "fp16", 0),
+    ("sq8", "sq8", 0),
+    ("sq8 + rerank", "sq8", None),
+    ("pq", "pq", 0),
+    ("pq + rerank", "pq", None),
+)
+
+def load_index_vectors(index_file: Path) -> np.ndarray:
+    index = faiss.read_index(str(index_file))
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        if isinstance(index, faiss.IndexIDMap2):
+            return index.reconstruct_batch(ids)
+        return faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """
+    Topic clusters in a low-dimensional latent space projected up to `dimension`,
+    plus a little isotropic noise: sentence embeddings have a far lower
+    intrinsic dimension than their width, which is what PQ exploits.
+    """
+    rng = np.random.default_rng(seed)
+    latent = 48
+    centers = rng.normal(size=(max(16, count // 250), latent))
+    points = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, latent))
+    projection = rng.normal(size=(latent, dimension)) / np.sqrt(latent)
+    return (points @ projection + 0.1 * rng.normal(size=(count, dimension))).astype(np.float32)
+
+def ground_truth(base: np.ndarray, queries: np.ndarray, metric: str, k: int) -> np.ndarray:
+    base, queries = base.copy(), queries.copy()
+    if metric == "ip":
+        faiss.normalize_L2(base)
+        faiss.normalize_L2(queries)
+        index = faiss.IndexFlatIP(base.shape[1])
+    else:
+        index = faiss.IndexFlatL2(base.shape[1])
+    index.add(base)
+    return index.search(queries, k)[1]
+
+def evaluate(args, label, compression, rerank_factor, base, queries, truth, k=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        indexer = FaissIndexer(
+            Path(tmp),
+            dimension=base.shape[1],
+            index_type=args.index_type,
+            compression=compression,
+            rerank_factor=rerank_factor,
+            metric=args.metric,
+            nlist=args.nlist,
+            pq_m=args.pq_m,
+            compact_interval=1e9,
+        )
+        metadata = [{"filename": "eval", "type": "chunk", "id": str(i), "content_snippet": ""}
+                    for i in range(len(base))]
+        started = time.perf_counter()
+        with indexer.batch(flush_size=len(base)):
+            indexer.add_documents(base, metadata)
+        if indexer._migration_thread is not None:
+            indexer._migration_thread.join()
+        build_seconds = time.perf_counter() - started
+        served = f"{indexer.active_index_type}/{indexer.active_compression}"
+
+        started = time.perf_counter()
+        results = indexer.search_many(queries, k)
+        query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        hits = sum(len({int(m["id"]) for m in found} & set(expected.tolist()))
+                   for (found, _), expected in zip(results, truth))
+        index_bytes = len(faiss.serialize_index(indexer.index))
+        store_bytes = indexer.vectors_file.stat().st_size if indexer.vectors is not None else 0
+        indexer.close()
+    return {
+        "label": label,
+        "served": served,
+        "recall": hits / (k * len(queries)),
+        "bytes_per_vector": index_bytes / len(base),
+        "store_bytes_per_vector": store_bytes / len(base),
+        "query_ms": query_ms,
+        "build_s": build_seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default="data/index", help="Index directory to take vectors from")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--index-type", default="flat", choices=("flat", "hnsw", "ivf_flat"))
+    parser.add_argument("--metric", default="ip", choices=("ip", "l2"))
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--nlist", type=int, default=256, help="IVF cells for --index-type ivf_flat")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    vectors = None
+    index_file = Path(args.index_dir) / "faiss_index.bin"
+    if not args.synthetic and index_file.exists():
+        vectors = load_index_vectors(index_file)
+        if len(vectors) < 39 * 256 + args.queries:
+            print(f"{index_file} holds only {len(vectors)} vectors (PQ needs ~{39 * 256} to train); using synthetic data")
+            vectors = None
+        else:
+            print(f"{len(vectors)} vectors from {index_file}")
+    if vectors is None:
+        vectors = synthetic_vectors(args.synthetic or 50000, args.dimension)
+        print(f"{len(vectors)} synthetic vectors, dimension {vectors.shape[1]}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    rng = np.random.default_rng(1)
+    held_out = rng.choice(len(vectors), args.queries, replace=False)
+    keep = np.ones(len(vectors), dtype=bool)
+    keep[held_out] = False
+    base = vectors[keep]
+    queries = vectors[held_out] + 0.05 * vectors.std() * rng.normal(size=(args.queries, vectors.shape[1])).astype(np.float32)
+    truth = ground_truth(base, queries, args.metric, 10)
+
+    rows = []
+    for label, compression, rerank_factor in MODES:
+        if rerank_factor is None:
+            rerank_factor = args.rerank_factor
+            label = f"{label} x{rerank_factor}"
+        rows.append(evaluate(args, label, compression, rerank_factor, base, queries, truth))
+
+    baseline = rows[0]["bytes_per_vector"]
+    print(f"\nindex_type={args.index_type} metric={args.metric} pq_m={args.pq_m} queries={args.queries}")
+    print(f"{'mode':<18}{'served as':<16}{'recall@10':>10}{'B/vector':>10}{'index MB / 1M':>15}"
+          f"{'vs float32':>11}{'mmap MB / 1M':>14}{'ms/query':>10}{'build s':>9}")
+    for row in rows:
+        print(
+            f"{row['label']:<18}{row['served']:<16}{row['recall']:>10.3f}{row['bytes_per_vector']:>10.0f}"
+            f"{row['bytes_per_vector'] * 1e6 / 2**20:>15.0f}{baseline / row['bytes_per_vector']:>10.1f}x"
+            f"{row['store_bytes_per_vector'] * 1e6 / 2**20:>14.0f}{row['query_ms']:>10.2f}{row['build_s']:>9.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -123,7 +123,7 @@ const SearchTab = () => {
           ) : (
             <div className="results-list">
               {results.map((res, i) => {
-                const relevance = Math.max(0, (1 - (res.score || 0)) * 100);
+                const relevance = Math.max(0, (res.score || 0) * 100);
                 const excerpt = res.summary || res.content_snippet || 'No preview available.';
                 const date = res.ingest_date ? new Date(res.ingest_date).toLocaleDateString('en-IN', { day: '2-digit', month: 'short', year: 'numeric' }) : '—';
 
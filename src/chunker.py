@@ -0,0 +1,136 @@
+import re
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Sentence boundary: terminal punctuation (optionally closed by a quote or
+# bracket) followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+WORD = re.compile(r'\S+')
+# Rough WordPiece count when no tokenizer is available: words and punctuation
+APPROX_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+def approx_token_counts(texts: Sequence[str]) -> List[int]:
+    return [len(APPROX_TOKEN.findall(t)) for t in texts]
+
+def tokenizer_counter(tokenizer) -> Callable[[Sequence[str]], List[int]]:
+    """Batch token counter backed by a Hugging Face tokenizer (no special tokens)."""
+    def count(texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+    return count
+
+class TextChunker:
+    """
+    Splits cleaned text into chunks of at most `max_tokens` tokens along
+    sentence boundaries, repeating up to `overlap_tokens` tokens of trailing
+    sentences at the start of the next chunk. Sentences longer than the window
+    are split on words. Token counts come from the embedding model's tokenizer
+    when one is given, so chunks are never silently truncated by the encoder.
+
+    The input is expected to be whitespace-normalized (`clean_text`); chunk
+    boundaries do not depend on newlines. For PDFs, `page_starts` (character
+    offset of each page in the text) gives every chunk the page it starts on.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 200,
+        overlap_tokens: int = 40,
+        count_tokens: Optional[Callable[[Sequence[str]], List[int]]] = None,
+    ):
+        self.max_tokens = max(8, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.count_tokens = count_tokens or approx_token_counts
+
+    @classmethod
+    def from_config(cls, config: Dict, tokenizer=None, model_max_tokens: Optional[int] = None) -> "TextChunker":
+        """
+        Reads the `chunking` section. `model_max_tokens` (the encoder's sequence
+        limit, special tokens included) caps the window.
+        """
+        cfg = config.get("chunking", {}) or {}
+        max_tokens = int(cfg.get("max_tokens", 200))
+        if model_max_tokens:
+            # [CLS] / [SEP]
+            max_tokens = min(max_tokens, model_max_tokens - 2)
+        return cls(
+            max_tokens=max_tokens,
+            overlap_tokens=int(cfg.get("overlap_tokens", 40)),
+            count_tokens=tokenizer_counter(tokenizer) if tokenizer is not None else None,
+        )
+
+    def chunk(self, text: str, page_starts: Optional[Sequence[int]] = None) -> List[Dict]:
+        """
+        Returns [{"text": str, "page": int | None}, ...] in document order.
+        Pages are 1-based.
+        """
+        if not text or not text.strip():
+            return []
+        units = self._units(text)
+        chunks = []
+        window: List[tuple] = []
+        window_tokens = 0
+        for unit in units:
+            n_tokens = unit[2]
+            if window and window_tokens + n_tokens > self.max_tokens:
+                chunks.append(self._emit(text, window, page_starts))
+                # Carry trailing sentences over as overlap
+                kept, kept_tokens = [], 0
+                for prev in reversed(window):
+                    if kept_tokens + prev[2] > self.overlap_tokens:
+                        break
+                    kept.insert(0, prev)
+                    kept_tokens += prev[2]
+                if kept_tokens + n_tokens > self.max_tokens:
+                    kept, kept_tokens = [], 0
+                window, window_tokens = kept, kept_tokens
+            window.append(unit)
+            window_tokens += n_tokens
+        if window:
+            chunks.append(self._emit(text, window, page_starts))
+        return chunks
+
+    def _units(self, text: str) -> List[tuple]:
+        """(start, end, tokens) spans: sentences, with over-long ones split on words."""
+        spans = []
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            spans.append((start, match.start() + len(match.group().rstrip())))
+            start = match.end()
+        if start < len(text):
+            spans.append((start, len(text.rstrip())))
+        spans = [(s, e) for s, e in spans if e > s]
+
+        counts = self.count_tokens([text[s:e] for s, e in spans])
+        units = []
+        for (s, e), n_tokens in zip(spans, counts):
+            if n_tokens <= self.max_tokens:
+                units.append((s, e, n_tokens))
+            else:
+                units.extend(self._split_long(text, s, e))
+        return units
+
+    def _split_long(self, text: str, start: int, end: int) -> List[tuple]:
+        words = [(m.start() + start, m.end() + start) for m in WORD.finditer(text[start:end])]
+        counts = self.count_tokens([text[s:e] for s, e in words])
+        pieces = []
+        piece_start, piece_end, piece_tokens = None, None, 0
+        for (s, e), n_tokens in zip(words, counts):
+            if piece_start is not None and piece_tokens + n_tokens > self.max_tokens:
+                pieces.append((piece_start, piece_end, piece_tokens))
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = s
+            piece_end = e
+            piece_tokens += n_tokens
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, piece_tokens))
+        return pieces
+
+    @staticmethod
+    def _emit(text: str, window: List[tuple], page_starts: Optional[Sequence[int]]) -> Dict:
+        start, end = window[0][0], window[-1][1]
+        page = bisect_right(page_starts, start) if page_starts else None
+        return {"text": text[start:end], "page": page or None}
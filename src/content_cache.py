@@ -0,0 +1,123 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from .utils import setup_logging
+
+logger = setup_logging("Content_Cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    sha256      TEXT PRIMARY KEY,
+    filename    TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    chunks_hash TEXT NOT NULL,
+    dim         INTEGER NOT NULL,
+    embeddings  BLOB NOT NULL,
+    created_at  REAL NOT NULL,
+    model       TEXT,
+    backend     TEXT,
+    normalize   INTEGER
+);
+"""
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunks_hash(texts: List[str]) -> str:
+    """Fingerprint of the chunk texts, so cached vectors are reused only while chunking is unchanged."""
+    return hashlib.sha1(json.dumps(texts).encode("utf-8")).hexdigest()
+
+class ContentCache:
+    """
+    Content-addressed ingest cache: SHA-256 of the file bytes -> extracted
+    data (text, summary, categories) and the embeddings that were indexed for
+    it. A file whose bytes were seen before is never re-OCRed, re-summarized
+    or re-embedded, whatever its name. Each entry records the embedder that
+    produced its vectors (`EmbeddingGenerator.signature`), so callers can tell
+    when they no longer fit the index.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate_schema(conn)
+
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(content)")}
+        if "model" in columns:
+            return
+        # Entries cached before the embedder was recorded stay NULL, i.e. never match
+        logger.info("Adding embedder columns to content cache...")
+        conn.execute("ALTER TABLE content ADD COLUMN model TEXT")
+        conn.execute("ALTER TABLE content ADD COLUMN backend TEXT")
+        conn.execute("ALTER TABLE content ADD COLUMN normalize INTEGER")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Returns {"filename", "data", "chunks_hash", "embedder", "embeddings"} or None."""
+        row = self._conn().execute(
+            "SELECT filename, data, chunks_hash, dim, embeddings, model, backend, normalize "
+            "FROM content WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+        if row is None:
+            return None
+        filename, data, texts_hash, dim, blob, model, backend, normalize = row
+        return {
+            "filename": filename,
+            "data": json.loads(data),
+            "chunks_hash": texts_hash,
+            "embedder": {
+                "model": model,
+                "backend": backend,
+                "normalize": None if normalize is None else bool(normalize),
+            },
+            "embeddings": np.frombuffer(blob, dtype=np.float32).reshape(-1, dim).copy(),
+        }
+
+    def put(self, sha256: str, filename: str, data: Dict, texts_hash: str, embeddings: np.ndarray,
+            embedder: Dict):
+        """Caches `embeddings` as produced by the embedder described by `embedder` (its signature)."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO content (sha256, filename, data, chunks_hash, dim, embeddings, "
+                "created_at, model, backend, normalize) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, filename, json.dumps(data, default=str), texts_hash,
+                 embeddings.shape[1], embeddings.tobytes(), time.time(),
+                 embedder["model"], embedder["backend"], int(embedder["normalize"])),
+            )
+
+    def set_filename(self, sha256: str, filename: str):
+        """Records `filename` as the copy of this content that is currently indexed."""
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE content SET filename = ? WHERE sha256 = ?", (filename, sha256))
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
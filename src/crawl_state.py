@@ -0,0 +1,236 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .utils import setup_logging
+
+logger = setup_logging("Crawl_State")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url           TEXT PRIMARY KEY,
+    kind          TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT,
+    links         TEXT,
+    path          TEXT,
+    fetched_at    REAL NOT NULL
+);
+"""
+
+class CrawlState:
+    """
+    What the crawler last saw at each URL: HTTP validators (ETag /
+    Last-Modified), the SHA-256 of the body and, for pages, the outbound
+    links. Recrawls send conditional requests from it and skip pages and
+    files whose content did not change.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["links"] = json.loads(entry["links"]) if entry["links"] else []
+        return entry
+
+    def record(
+        self,
+        url: str,
+        kind: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        content_hash: Optional[str],
+        links: Optional[List[str]] = None,
+        path: Optional[Path] = None,
+    ):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO urls "
+                "(url, kind, etag, last_modified, content_hash, links, path, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, kind, etag, last_modified, content_hash,
+                 json.dumps(links) if links is not None else None,
+                 str(path) if path else None, time.time()),
+            )
+
+    def touch(self, url: str):
+        """Marks `url` as re-validated (304 Not Modified)."""
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE urls SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def forget_content(self):
+        """
+        Drops the validators and content hashes (keeping paths and links), so the
+        next crawl fetches every URL in full and treats it as changed, e.g. after
+        the index it was delivered to has been cleared.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE urls SET etag = NULL, last_modified = NULL, content_hash = NULL")
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM urls")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+FRONTIER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url_hash INTEGER PRIMARY KEY,   -- 64-bit hash of the URL; the dedup key
+    url      TEXT,                  -- dropped once the URL is done
+    host     TEXT,
+    depth    INTEGER NOT NULL,
+    priority INTEGER NOT NULL,      -- lower is fetched first
+    status   TEXT NOT NULL,         -- pending | in_progress | done | failed
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_queue ON frontier(status, priority, added_at);
+
+CREATE TABLE IF NOT EXISTS crawl_job (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def url_hash(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+class CrawlFrontier:
+    """
+    Disk-backed crawl frontier. Every URL ever queued by the current crawl is
+    a row keyed by a 64-bit hash, so deduplication costs one primary-key
+    lookup instead of a set of full URL strings in memory, and a stopped or
+    interrupted crawl resumes from the pending rows.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(FRONTIER_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self, job: Dict):
+        """Discards the previous crawl and records the settings of a new one."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM frontier")
+            conn.execute("DELETE FROM crawl_job")
+            conn.execute("INSERT INTO crawl_job (key, value) VALUES ('job', ?)", (json.dumps(job),))
+
+    def job(self) -> Optional[Dict]:
+        row = self._conn().execute("SELECT value FROM crawl_job WHERE key = 'job'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def resume(self) -> int:
+        """Requeues URLs left in progress by an interrupted crawl; returns the pending count."""
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE frontier SET status = 'pending' WHERE status = 'in_progress'")
+        return self.pending()
+
+    def add(self, items: Iterable[Tuple[str, int, int]]) -> int:
+        """Queues (url, depth, priority) items not seen before; returns how many were new."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            return max(conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url_hash, url, host, depth, priority, status, added_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                [(url_hash(url), url, urlparse(url).netloc, depth, priority, now)
+                 for url, depth, priority in items],
+            ).rowcount, 0)
+
+    def pop(self, exclude_hosts: Iterable[str] = ()) -> Optional[Tuple[str, int]]:
+        """Claims the highest-priority pending (url, depth) not on `exclude_hosts`."""
+        exclude_hosts = list(exclude_hosts)
+        sql = "SELECT url_hash, url, depth FROM frontier WHERE status = 'pending'"
+        if exclude_hosts:
+            sql += f" AND host NOT IN ({','.join('?' * len(exclude_hosts))})"
+        sql += " ORDER BY priority, added_at LIMIT 1"
+        conn = self._conn()
+        with conn:
+            row = conn.execute(sql, exclude_hosts).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE frontier SET status = 'in_progress' WHERE url_hash = ?", (row[0],))
+        return row[1], row[2]
+
+    def release(self, url: str):
+        """Puts a claimed URL back in the queue, in its original position."""
+        self._set_status(url, "pending")
+
+    def mark_done(self, url: str):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE frontier SET status = 'done', url = NULL, host = NULL WHERE url_hash = ?", (url_hash(url),)
+            )
+
+    def mark_failed(self, url: str):
+        self._set_status(url, "failed")
+
+    def _set_status(self, url: str, status: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE frontier SET status = ? WHERE url_hash = ?", (status, url_hash(url)))
+
+    def pending(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM frontier WHERE status IN ('pending', 'in_progress')"
+        ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM frontier GROUP BY status").fetchall()
+        return dict(rows)
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM frontier")
+            conn.execute("DELETE FROM crawl_job")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,30 +1,102 @@
+from pathlib import Path
 from sentence_transformers import SentenceTransformer
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 import numpy as np
 from .utils import setup_logging
 
 logger = setup_logging("Embeddings_Module")
 
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        logger.info(f"Loading embedding model: {model_name}")
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        normalize: bool = False,
+        backend: str = "torch",
+        models_dir: Optional[Path] = None,
+        threads: int = 0,
+    ):
+        """
+        Args:
+            model_name: SentenceTransformers model to load.
+            normalize: Return L2-normalized vectors (required for the "ip" index metric,
+                       where inner product then equals cosine similarity).
+            backend: "torch" (SentenceTransformers / PyTorch), "onnx" (the same model
+                     exported to ONNX and run with ONNX Runtime) or "onnx_int8" (that
+                     export with dynamically quantized int8 weights).
+            models_dir: Where ONNX exports are kept (exported on first use).
+            threads: ONNX Runtime intra-op threads (0 = one per CPU core).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+        logger.info(f"Loading embedding model: {model_name} ({backend})")
+        self.model_name = model_name
+        self.normalize = normalize
+        self.backend = backend
         try:
-            self.model = SentenceTransformer(model_name)
+            if backend == "torch":
+                self.model = SentenceTransformer(model_name)
+            else:
+                # Optional dependencies (onnx, onnxruntime): only needed for these backends
+                from .onnx_encoder import OnnxEncoder, export_dir_for, export_model, quantize_model
+                export_dir = export_dir_for(models_dir or Path("data/models"), model_name)
+                export_model(model_name, export_dir)
+                if backend == "onnx_int8":
+                    quantize_model(export_dir)
+                self.model = OnnxEncoder(export_dir, quantized=backend == "onnx_int8", threads=threads)
+        except ImportError as e:
+            logger.error(f"Embedding backend {backend!r} needs the optional ONNX packages (see requirements.txt): {e}")
+            raise
         except Exception as e:
             logger.error(f"Failed to load model {model_name}: {e}")
             raise e
 
+    @classmethod
+    def from_config(cls, config: Dict) -> "EmbeddingGenerator":
+        """Reads `search.model_name / metric / embedding_backend / onnx_threads` and `directories.models`."""
+        search_cfg = config.get("search", {}) or {}
+        return cls(
+            search_cfg.get("model_name", "all-MiniLM-L6-v2"),
+            normalize=search_cfg.get("metric", "l2") == "ip",
+            backend=search_cfg.get("embedding_backend", "torch"),
+            models_dir=Path((config.get("directories", {}) or {}).get("models", "data/models")),
+            threads=int(search_cfg.get("onnx_threads", 0)),
+        )
+
+    @property
+    def tokenizer(self):
+        """The model's Hugging Face tokenizer (used to size chunks), or None."""
+        return getattr(self.model, "tokenizer", None)
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """Tokens the model reads per text; anything longer is truncated."""
+        return getattr(self.model, "max_seq_length", None)
+
+    @property
+    def signature(self) -> Dict:
+        """What determines the vectors: the same text embeds identically only under an equal signature."""
+        return {"model": self.model_name, "backend": self.backend, "normalize": bool(self.normalize)}
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the model's parameters and buffers (ONNX: the weights file loaded)."""
+        if self.backend != "torch":
+            return self.model.model_file.stat().st_size
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
     def generate(self, texts: Union[str, List[str]]) -> np.ndarray:
         """
         Generates embeddings for a string or list of strings.
-        Returns a numpy array.
+        Returns a float32 numpy array of shape (n, dim).
         """
         if isinstance(texts, str):
             texts = [texts]
             
         try:
-            embeddings = self.model.encode(texts)
-            return np.array(embeddings)
+            embeddings = self.model.encode(texts, normalize_embeddings=self.normalize)
+            return np.ascontiguousarray(embeddings, dtype=np.float32)
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise e
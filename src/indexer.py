@@ -1,30 +1,245 @@
 import faiss
+import json
 import numpy as np
+import os
 import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
-from .utils import setup_logging
+from .metadata_store import MetadataStore
+from .vector_store import VectorStore
+from .utils import setup_logging, ProcessLock, ReadWriteLock
 
 logger = setup_logging("Indexer_Module")
 
+# Every WAL record is framed as <payload length><pickled payload> so a torn
+# write at the tail of the log can be detected and discarded on replay. The log
+# carries vectors ({"start", "vectors"}) and removals ({"remove"}); metadata is
+# committed to the SQLite store.
+WAL_HEADER = struct.Struct("<Q")
+
+# Supported `search.index_type` values
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+IVF_TYPES = ("ivf_flat", "ivf_pq")
+
+# Supported `search.compression` values: how vectors are encoded inside the
+# index. "fp16" halves memory, "sq8" (8-bit scalar quantization) quarters it
+# and "pq" stores pq_m * pq_nbits bits per vector. Lossy encodings re-rank
+# their top candidates against a memory-mapped float32 copy of the vectors.
+COMPRESSIONS = ("none", "fp16", "sq8", "pq")
+LOSSY_COMPRESSIONS = ("sq8", "pq")
+# Vectors needed to train the per-dimension ranges of 8-bit scalar quantization
+SQ8_MIN_TRAIN = 1000
+
+# Supported `search.metric` values: "l2" (Euclidean distance) or "ip" (inner
+# product over L2-normalized vectors, i.e. cosine similarity)
+METRICS = {"l2": faiss.METRIC_L2, "ip": faiss.METRIC_INNER_PRODUCT}
+
+# Maps index snapshots read-only instead of reading them into memory: flat
+# codes, HNSW storage and IVF inverted lists become views of the page cache.
+# Absent from older faiss builds, which then read the file as before.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+# Flat and HNSW indexes are wrapped in an id map so vectors keep stable ids
+# across removals; IVF indexes store ids in their inverted lists.
+IDMAP_TYPES = (faiss.IndexIDMap, faiss.IndexIDMap2)
+
 class FaissIndexer:
-    def __init__(self, index_path: Path, dimension: int = 384):
-        self.index_path = index_path
-        self.index_file = index_path / "faiss_index.bin"
-        self.metadata_file = index_path / "metadata.pkl"
+    def __init__(
+        self,
+        index_path: Path,
+        dimension: int = 384,
+        wal_max_bytes: int = 64 * 1024 * 1024,
+        compact_interval: float = 300.0,
+        wal_fsync: bool = False,
+        batch_flush_size: int = 2048,
+        index_type: str = "flat",
+        nlist: int = 1024,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        pq_m: int = 48,
+        pq_nbits: int = 8,
+        metric: str = "l2",
+        tombstone_ratio: float = 0.2,
+        compression: str = "none",
+        rerank_factor: int = 4,
+        mmap: bool = True,
+    ):
+        """
+        Args:
+            index_path: Directory holding the index snapshot, the write-ahead log and
+                the SQLite metadata store.
+            dimension: Embedding dimension.
+            wal_max_bytes: Compact the log into a new snapshot once it grows past this size.
+            compact_interval: Compact a non-empty log at least this often (seconds); a
+                timer does it even when no further writes arrive. A log found on
+                load is compacted straight away.
+            wal_fsync: fsync the log after every append (durable but slower).
+            batch_flush_size: Vectors buffered inside `batch()` before an intermediate flush.
+            index_type: "flat" (exact), "hnsw", "ivf_flat" or "ivf_pq". IVF types need
+                training and stay flat until enough vectors exist.
+            nlist / nprobe: IVF cells, and cells visited per query.
+            hnsw_m / ef_construction / ef_search: HNSW graph degree and beam widths.
+            pq_m / pq_nbits: IVF-PQ sub-quantizers per vector and bits per code.
+            metric: "l2" or "ip". With "ip" vectors are L2-normalized on the way in,
+                so search scores are cosine similarities.
+            tombstone_ratio: HNSW cannot remove vectors; removed ones are masked out
+                of searches and the index is rebuilt once they exceed this fraction.
+            compression: "none", "fp16", "sq8" or "pq" vector encoding for flat,
+                HNSW and IVF indexes (ivf_pq is always "pq"). Encodings that need
+                training stay uncompressed until enough vectors exist.
+            rerank_factor: With "sq8" / "pq", fetch k * rerank_factor candidates and
+                re-score them exactly from a memory-mapped float32 copy of the
+                vectors (`vectors.f32`). 0 disables the copy and re-ranking.
+            mmap: Map the snapshot instead of reading it, so loading is near-instant
+                and processes serving the same index share its pages. The first
+                write promotes the index to a private in-memory copy; the compacted
+                snapshot is mapped again once no write has arrived for
+                compact_interval, so a trickle of writes keeps the copy instead of
+                paying for a new one each time.
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type {index_type!r}; expected one of {INDEX_TYPES}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {tuple(METRICS)}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+        if index_type == "ivf_flat" and compression == "pq":
+            # An IVF index with PQ codes is ivf_pq
+            index_type = "ivf_pq"
+        elif index_type == "ivf_pq":
+            compression = "pq"
+        self.index_path = Path(index_path)
+        self.index_file = self.index_path / "faiss_index.bin"
+        self.store_file = self.index_path / "metadata.db"
+        # Pre-SQLite metadata list; imported into the store on first load
+        self.legacy_metadata_file = self.index_path / "metadata.pkl"
+        self.wal_file = self.index_path / "wal.log"
+        self.vectors_file = self.index_path / "vectors.f32"
         self.dimension = dimension
         self.index = None
-        self.metadata = [] # List of dicts, index matches FAISS id
 
+        self.wal_max_bytes = wal_max_bytes
+        self.compact_interval = compact_interval
+        self.wal_fsync = wal_fsync
+        self._wal = None
+        self._wal_bytes = 0
+        self._last_compaction = time.monotonic()
+        self._compaction_thread: Optional[threading.Thread] = None
+        # Fires once compact_interval has passed, so a log left behind by the
+        # last writes is folded in even if nothing else is ever written
+        self._compaction_timer: Optional[threading.Timer] = None
+        self._closed = False
+        self._last_write = time.monotonic()
+        # `generation` as of the last snapshot compacted with no log left over:
+        # while it still matches, the in-memory index equals the file and can be mapped
+        self._snapshot_generation = -1
+        # Searches share the read side; adds, reloads and the WAL swap at the end of
+        # compaction take the write side.
+        self.lock = ReadWriteLock()
+        # Serializes writers across processes sharing index_path (the API, the
+        # folder monitor, scripts); always taken before `lock`
+        self.process_lock = ProcessLock(self.index_path / ".lock")
+        # (snapshot inode/mtime/size, WAL inode/size) as last seen by this
+        # process; anything else on disk was written by another process
+        self._disk_state = None
+        # Bumped whenever the index is reloaded or cleared, which replaces the log
+        self._reloads = 0
+        self._compaction_guard = threading.Lock()
+        self.batch_flush_size = batch_flush_size
+        self._batches = threading.local()
+
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.metric = metric
+        self.metric_type = METRICS[metric]
+        self._migration_thread: Optional[threading.Thread] = None
+        self._migration_guard = threading.Lock()
+        # Ids removed while a migration runs, replayed onto its copy at the swap
+        self._migration_removed: Optional[List[np.ndarray]] = None
+        self.tombstone_ratio = tombstone_ratio
+        self.compression = compression
+        self.rerank_factor = max(0, rerank_factor)
+        self.mmap = mmap and MMAP_FLAG is not None
+        # True while self.index is a read-only view of the snapshot file
+        self._mapped = False
+        # Vectors in the index without metadata (removed from an HNSW index)
+        self._tombstones = 0
+        # Next FAISS id to assign; ids are never renumbered or reused
+        self.next_id = 0
+        # Filter -> (filters, id bitmap), patched in place by every write
+        self._selector_cache: Dict[str, Tuple[Dict, np.ndarray]] = {}
+        self._selector_cache_size = 64
+        self._selector_lock = threading.Lock()
+        # Bumped on every change to the searchable contents; caches key on it
+        self.generation = 0
+
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        self.store = MetadataStore(self.store_file)
+        # Exact copy of every vector for re-ranking; kept from the first add, so
+        # it is complete by the time a lossy index is trained
+        self.vectors: Optional[VectorStore] = None
+        if compression in LOSSY_COMPRESSIONS and self.rerank_factor > 0:
+            self.vectors = VectorStore(self.vectors_file, dimension)
         self._load_or_create_index()
 
+    @classmethod
+    def from_config(cls, index_path: Path, config: Optional[Dict] = None) -> "FaissIndexer":
+        """Builds an indexer using the `search` section of the app config."""
+        search_cfg = (config or {}).get("search", {}) or {}
+        return cls(
+            index_path,
+            wal_max_bytes=int(search_cfg.get("wal_max_mb", 64)) * 1024 * 1024,
+            compact_interval=float(search_cfg.get("compact_interval", 300)),
+            wal_fsync=bool(search_cfg.get("wal_fsync", False)),
+            batch_flush_size=int(search_cfg.get("batch_flush_size", 2048)),
+            index_type=search_cfg.get("index_type", "flat"),
+            nlist=int(search_cfg.get("nlist", 1024)),
+            nprobe=int(search_cfg.get("nprobe", 16)),
+            hnsw_m=int(search_cfg.get("hnsw_m", 32)),
+            ef_construction=int(search_cfg.get("ef_construction", 200)),
+            ef_search=int(search_cfg.get("ef_search", 64)),
+            pq_m=int(search_cfg.get("pq_m", 48)),
+            pq_nbits=int(search_cfg.get("pq_nbits", 8)),
+            metric=search_cfg.get("metric", "l2"),
+            tombstone_ratio=float(search_cfg.get("tombstone_ratio", 0.2)),
+            compression=search_cfg.get("compression", "none"),
+            rerank_factor=int(search_cfg.get("rerank_factor", 4)),
+            mmap=bool(search_cfg.get("mmap_index", True)),
+        )
+
     def _load_or_create_index(self):
-        if self.index_file.exists() and self.metadata_file.exists():
+        self._wait_for_compaction()
+        with self.process_lock, self.lock.write_lock():
+            self._load_locked()
+        if self._wal_bytes:
+            # Fold the log left by the last run into the snapshot now rather than
+            # replaying it again on every later start
+            self._start_compaction()
+        self._maybe_migrate()
+
+    def _load_locked(self):
+        """Loads the snapshot and replays the log; called with the process and write locks held."""
+        self._close_wal()
+        has_metadata = self.legacy_metadata_file.exists() or self.store.count() > 0
+        if self.index_file.exists() and has_metadata:
             try:
-                logger.info("Loading existing index and metadata...")
-                self.index = faiss.read_index(str(self.index_file))
-                with open(self.metadata_file, "rb") as f:
-                    self.metadata = pickle.load(f)
+                logger.info("Loading existing index...")
+                self.index = self._read_index()
+                self._enable_reconstruct(self.index)
+                if self.legacy_metadata_file.exists():
+                    self._import_legacy_metadata()
                 logger.info(f"Loaded index with {self.index.ntotal} vectors.")
             except Exception as e:
                 logger.error(f"Failed to load index, creating new one: {e}")
@@ -32,55 +247,954 @@ class FaissIndexer:
         else:
             self._create_new_index()
 
+        self._apply_search_params(self.index)
+        ids = self._stored_ids(self.index)
+        self.next_id = int(ids.max()) + 1 if len(ids) else 0
+        self._replay_wal()
+        self._fill_vector_store()
+        # Metadata committed for vectors that never reached the log must not
+        # attach itself to the next vectors added under the same ids.
+        self.store.drop_from(self.next_id)
+        if self._has_ids(self.index):
+            # Stay above ids whose vectors were removed, even the highest ones
+            self.next_id = max(self.next_id, self.store.next_id())
+        self._tombstones = self.index.ntotal - self.store.count()
+        self._selector_cache.clear()
+        self.generation += 1
+        self._open_wal()
+        self._disk_state = self._read_disk_state()
+        self._reloads += 1
+
     def _create_new_index(self):
-        logger.info(f"Creating new FAISS index (dim={self.dimension})...")
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+        logger.info(
+            f"Creating new FAISS index (dim={self.dimension}, type={self.index_type}, "
+            f"compression={self.compression})..."
+        )
+        # Types and encodings that need training start exact and migrate once trainable
+        self.index = self._build_index(*self._untrained_target())
+        self._mapped = False
+
+    def _read_index(self):
+        """Reads the snapshot, memory-mapped when enabled."""
+        if self.mmap:
+            try:
+                index = faiss.read_index(str(self.index_file), MMAP_FLAG)
+                self._mapped = True
+                return index
+            except Exception as e:
+                logger.warning(f"Could not memory-map {self.index_file.name}, reading it instead: {e}")
+        self._mapped = False
+        return faiss.read_index(str(self.index_file))
+
+    def _make_writable(self):
+        """
+        Replaces a memory-mapped index with an in-memory copy before it is
+        modified (FAISS aborts on writes to a mapped view). Called under the
+        write lock.
+        """
+        if not self._mapped:
+            return
+        started = time.monotonic()
+        self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        self._mapped = False
+        self._enable_reconstruct(self.index)
+        self._apply_search_params(self.index)
+        logger.info(f"Copied mapped index into memory for writing ({time.monotonic() - started:.2f}s).")
+
+    def _import_legacy_metadata(self):
+        """Moves a pickled metadata list (list position == FAISS id) into the store."""
+        with open(self.legacy_metadata_file, "rb") as f:
+            records = pickle.load(f)
+        self.store.import_records(records[:self.index.ntotal])
+        self.legacy_metadata_file.rename(self.legacy_metadata_file.with_suffix(".pkl.migrated"))
+
+    # ── index types ───────────────────────────────────────────────────────────
+
+    def _encoding(self, compression: str) -> str:
+        """index_factory code for the vector encoding."""
+        if compression == "fp16":
+            return "SQfp16"
+        if compression == "sq8":
+            return "SQ8"
+        if compression == "pq":
+            return f"PQ{self.pq_m}x{self.pq_nbits}"
+        return "Flat"
+
+    def _build_index(self, index_type: str, compression: str = "none"):
+        """Returns an empty (possibly untrained) index of the given type that accepts explicit ids."""
+        encoding = self._encoding(compression)
+        if index_type == "flat" and compression == "pq":
+            # IndexPQ cannot take an id selector (filters, tombstones); a single
+            # inverted list holding PQ codes is the same exhaustive scan and can
+            index = faiss.index_factory(self.dimension, f"IVF1,{encoding}", self.metric_type)
+        elif index_type == "flat":
+            if compression == "none":
+                base = faiss.IndexFlat(self.dimension, self.metric_type)
+            else:
+                base = faiss.index_factory(self.dimension, encoding, self.metric_type)
+            index = faiss.IndexIDMap2(base)
+        elif index_type == "hnsw":
+            if compression == "none":
+                hnsw = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, self.metric_type)
+            else:
+                hnsw = faiss.index_factory(self.dimension, f"HNSW{self.hnsw_m}_{encoding}", self.metric_type)
+            hnsw.hnsw.efConstruction = self.ef_construction
+            index = faiss.IndexIDMap2(hnsw)
+        else:
+            # ivf_flat with "none" / "fp16" / "sq8", or ivf_pq
+            index = faiss.index_factory(self.dimension, f"IVF{self.nlist},{encoding}", self.metric_type)
+        self._enable_reconstruct(index)
+        self._apply_search_params(index)
+        return index
+
+    def _apply_search_params(self, index):
+        kind = self._index_kind(index)
+        try:
+            if kind in IVF_TYPES:
+                faiss.extract_index_ivf(index).nprobe = self.nprobe
+            elif kind == "hnsw":
+                self._base_index(index).hnsw.efSearch = self.ef_search
+        except Exception as e:
+            logger.warning(f"Could not apply search parameters to {kind} index: {e}")
+
+    @staticmethod
+    def _base_index(index):
+        """The index inside an id map wrapper (or `index` itself)."""
+        if isinstance(index, IDMAP_TYPES):
+            return faiss.downcast_index(index.index)
+        return index
+
+    @staticmethod
+    def _has_ids(index) -> bool:
+        """False for indexes written before id maps, where ids are positions."""
+        return isinstance(index, IDMAP_TYPES + (faiss.IndexIVF,))
+
+    def _can_remove(self, index) -> bool:
+        # HNSW graphs cannot drop nodes; those removals become tombstones
+        return self._has_ids(index) and self._index_kind(index) != "hnsw"
+
+    @classmethod
+    def _index_kind(cls, index) -> str:
+        index = cls._base_index(index)
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(index, faiss.IndexIVF) and index.nlist == 1:
+            # Flat PQ (see _build_index)
+            return "flat"
+        if isinstance(index, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(index, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+
+    @classmethod
+    def _index_compression(cls, index) -> str:
+        index = cls._base_index(index)
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return "pq"
+        if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+        return "none"
+
+    @property
+    def active_index_type(self) -> str:
+        """Type of the index currently serving searches (may lag `index_type` until migrated)."""
+        return self._index_kind(self.index)
+
+    @property
+    def active_compression(self) -> str:
+        """Vector encoding of the index currently serving searches (may lag `compression`)."""
+        return self._index_compression(self.index)
+
+    def _min_train_vectors(self) -> int:
+        # FAISS wants ~39 points per centroid; PQ codebooks have 2**nbits centroids each
+        needed = 0
+        if self.index_type in IVF_TYPES:
+            needed = 39 * self.nlist
+        if self.compression == "pq":
+            needed = max(needed, 39 * 2 ** self.pq_nbits)
+        elif self.compression == "sq8":
+            needed = max(needed, SQ8_MIN_TRAIN)
+        return needed
+
+    def _untrained_target(self) -> Tuple[str, str]:
+        """What is served before there is enough data to train: IVF types are flat, only fp16 applies."""
+        index_type = "flat" if self.index_type in IVF_TYPES else self.index_type
+        return index_type, "fp16" if self.compression == "fp16" else "none"
+
+    def _target(self) -> Tuple[str, str]:
+        """(index type, compression) the index should have at its current size."""
+        if self.index.ntotal < self._min_train_vectors():
+            return self._untrained_target()
+        return self.index_type, self.compression
+
+    def _needs_rebuild(self) -> bool:
+        if not self._has_ids(self.index):
+            return True
+        current = (self._index_kind(self.index), self._index_compression(self.index))
+        if current != self._target() or self.index.metric_type != self.metric_type:
+            return True
+        return self._tombstones > 0 and self._tombstones >= self.tombstone_ratio * self.index.ntotal
+
+    def _maybe_migrate(self):
+        """
+        Rebuilds the index in the background when it differs from the configured
+        one: an existing index after `index_type`, `compression` or `metric`
+        changed, an IVF or quantized index that now has enough vectors to train,
+        an index without an id map, or one where tombstones have passed
+        `tombstone_ratio`.
+        """
+        if not self._needs_rebuild():
+            return
+        target = self._target()
+        with self._migration_guard:
+            if self._migration_thread is not None and self._migration_thread.is_alive():
+                return
+            if self.index.ntotal == 0:
+                with self.lock.write_lock():
+                    self.index = self._build_index(*target)
+                    self._mapped = False
+                    self._tombstones = 0
+                    self.generation += 1
+                return
+            self._migration_thread = threading.Thread(
+                target=self._migrate, name="faiss-migration", daemon=True
+            )
+            self._migration_thread.start()
+
+    def _migrate(self):
+        """
+        Trains and fills the configured index from the live vectors (tombstones
+        are dropped). Searches keep using the old index until the new one is
+        swapped in under the write lock; the writes made while it was being
+        built (adds and removals) are replayed onto it first. Only a reload
+        (another process compacted or cleared the index) discards the copy;
+        promoting a mapped index to memory or remapping it does not.
+        """
+        target = self._target()
+        target_name = "/".join(target)
+        try:
+            source_name = f"{self._index_kind(self.index)}/{self._index_compression(self.index)}"
+            with self.lock.read_lock():
+                source = self.index
+                next_id = self.next_id
+                reloads = self._reloads
+                self._migration_removed = []
+                ids = self._stored_ids(source)
+                if self._tombstones:
+                    ids = ids[np.isin(ids, np.fromiter(self.store.ids_matching({}), dtype=np.int64))]
+                vectors = self._prepare(self._vectors_for(source, ids))
+                if self.vectors is not None and source.metric_type != self.metric_type:
+                    # Keep the re-ranking copy in the new metric's form (normalized for ip)
+                    self.vectors.write(ids, vectors)
+            count = len(ids)
+            if self._index_compression(source) in LOSSY_COMPRESSIONS and self.vectors is None:
+                logger.warning(f"Migrating from {source_name}: source vectors are lossy reconstructions.")
+
+            logger.info(f"Migrating {count} vectors from {source_name} to {target_name} ({self.metric}) index...")
+            started = time.monotonic()
+            index = self._build_index(*target)
+            if not index.is_trained:
+                sample_size = min(count, max(256 * self.nlist, 256 * 2 ** self.pq_nbits, SQ8_MIN_TRAIN * 10))
+                sample = vectors[np.random.default_rng(0).choice(count, sample_size, replace=False)]
+                index.train(sample)
+            for start in range(0, count, 65536):
+                index.add_with_ids(vectors[start:start + 65536], ids[start:start + 65536])
+
+            with self.lock.write_lock():
+                removed = self._migration_removed or []
+                removed = np.concatenate(removed).astype(np.int64) if removed else np.empty(0, dtype=np.int64)
+                self._migration_removed = None
+                reloaded = self._reloads != reloads
+                if reloaded:
+                    logger.warning("Index was reloaded during migration; migrating the reloaded index instead.")
+                else:
+                    # Vectors added meanwhile are read from the live index, which
+                    # may since have been promoted to memory or remapped
+                    live = self._stored_ids(self.index)
+                    tail = live[(live >= next_id) & ~np.isin(live, removed)]
+                    if len(tail):
+                        index.add_with_ids(self._prepare(self._vectors_for(self.index, tail)), tail)
+                    if len(removed) and self._can_remove(index):
+                        index.remove_ids(removed)
+                    self.index = index
+                    self._mapped = False
+                    self._tombstones = index.ntotal - self.store.count()
+                    self._selector_cache.clear()
+                    self.generation += 1
+            if reloaded:
+                self._migration_thread = None
+                self._maybe_migrate()
+                return
+            logger.info(
+                f"Migrated index to {target_name} in {time.monotonic() - started:.1f}s "
+                f"({len(tail)} added and {len(removed)} removed meanwhile)."
+            )
+        except Exception as e:
+            self._migration_removed = None
+            logger.error(f"Index migration to {target_name} failed: {e}")
+            return
+        # Persist the new structure so the next start loads it directly
+        self._start_compaction()
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """float32, C-contiguous and, for the inner-product metric, unit length."""
+        vectors = np.array(vectors, dtype=np.float32, order="C")
+        if self.metric == "ip":
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def memory_usage(self) -> Dict:
+        """
+        Approximate size of the index in bytes: the snapshot (the serialized
+        index is its in-memory layout) plus vectors still in the log. With
+        `mapped` the snapshot lives in the page cache, shared between processes.
+        """
+        snapshot = self.index_file.stat().st_size if self.index_file.exists() else 0
+        return {
+            "bytes": snapshot + self._wal_bytes,
+            "mapped": self._mapped,
+            "vectors": self.index.ntotal,
+            "rerank_store_bytes": self.vectors_file.stat().st_size if self.vectors is not None else 0,
+        }
+
+    def to_similarity(self, distance: float) -> float:
+        """
+        Maps a raw FAISS score to a similarity where higher is better: the cosine
+        similarity itself for "ip", and 1 / (1 + distance) for "l2". Follows the
+        index currently serving searches, which lags `metric` until migrated.
+        """
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return float(distance)
+        return float(1.0 / (1.0 + distance))
+
+    @staticmethod
+    def _enable_reconstruct(index):
+        # IVF indexes need an id -> entry map to hand vectors back for migrations
+        # and to remove them; a hash table allows arbitrary (non-contiguous) ids
+        if isinstance(index, faiss.IndexIVF) and index.direct_map.type != faiss.DirectMap.Hashtable:
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+    @staticmethod
+    def _stored_ids(index) -> np.ndarray:
+        """Ids of every vector held by `index` (including tombstones)."""
+        if isinstance(index, IDMAP_TYPES):
+            return faiss.vector_to_array(index.id_map).astype(np.int64)
+        if isinstance(index, faiss.IndexIVF):
+            invlists = index.invlists
+            parts = [
+                faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+                for l in range(invlists.nlist) if invlists.list_size(l)
+            ]
+            return np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+        return np.arange(index.ntotal, dtype=np.int64)
+
+    def _vectors_for(self, index, ids: np.ndarray) -> np.ndarray:
+        if not len(ids):
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if (self.vectors is not None and self._index_compression(index) in LOSSY_COMPRESSIONS
+                and self.vectors.rows > int(ids.max())):
+            # Exact vectors instead of lossy reconstructions
+            return np.array(self.vectors.get(ids))
+        self._enable_reconstruct(index)
+        return index.reconstruct_batch(np.ascontiguousarray(ids, dtype=np.int64))
+
+    def _fill_vector_store(self):
+        """Copies vectors the re-ranking store is missing (e.g. when compression was just enabled)."""
+        if self.vectors is None:
+            return
+        ids = self._stored_ids(self.index)
+        missing = ids[ids >= self.vectors.rows]
+        if not len(missing):
+            return
+        if self._index_compression(self.index) in LOSSY_COMPRESSIONS:
+            logger.warning(f"Filling the re-ranking store with {len(missing)} lossy reconstructions.")
+        else:
+            logger.info(f"Copying {len(missing)} vectors into the re-ranking store...")
+        for start in range(0, len(missing), 65536):
+            part = np.sort(missing[start:start + 65536])
+            self._enable_reconstruct(self.index)
+            self.vectors.write(part, self._prepare(self.index.reconstruct_batch(part)))
+
+    def _add_vectors(self, vectors: np.ndarray, ids: np.ndarray):
+        if self.vectors is not None:
+            self.vectors.write(ids, vectors)
+        self._make_writable()
+        if self._has_ids(self.index):
+            self.index.add_with_ids(vectors, ids)
+        else:
+            # Legacy position-id index (until migrated): ids are always the next positions
+            self.index.add(vectors)
 
     def add_documents(self, embeddings: np.ndarray, docs_metadata: List[Dict]):
         """
         Adds vectors and corresponding metadata to the index.
+        The batch is appended to the write-ahead log; the full snapshot is only
+        rewritten by compaction. Inside `batch()` the vectors are buffered instead.
         """
         if len(docs_metadata) != embeddings.shape[0]:
             logger.error("Mismatch between embeddings count and metadata count.")
             return
 
+        embeddings = self._prepare(embeddings)
+        state = self._batch_state()
+        if state.depth > 0:
+            state.vectors.append(embeddings)
+            state.metadata.extend(docs_metadata)
+            state.pending += len(docs_metadata)
+            if state.pending >= state.flush_size:
+                self._flush_batch(state)
+            return
+
+        self._commit(embeddings, docs_metadata)
+
+    def _commit(self, embeddings: np.ndarray, docs_metadata: List[Dict]):
         try:
-            self.index.add(embeddings)
-            self.metadata.extend(docs_metadata)
-            self._save_index()
-            logger.info(f"Added {len(docs_metadata)} documents to index. Total: {self.index.ntotal}")
+            with self.process_lock, self.lock.write_lock():
+                self._catch_up()
+                start = self.next_id
+                self._append_wal({"start": start, "vectors": embeddings})
+                self._add_vectors(embeddings, np.arange(start, start + len(embeddings), dtype=np.int64))
+                self.next_id = start + len(embeddings)
+                self.store.add(start, docs_metadata)
+                self._update_filter_bitmaps(added_from=start)
+                self.generation += 1
+                self._last_write = time.monotonic()
+                total = self.index.ntotal
+            logger.info(f"Added {len(docs_metadata)} documents to index. Total: {total}")
+            self._maybe_compact()
+            self._maybe_migrate()
         except Exception as e:
             logger.error(f"Error adding documents to index: {e}")
 
-    def search(self, query_vector: np.ndarray, k: int = 5) -> Tuple[List[Dict], List[float]]:
+    # ── removals ──────────────────────────────────────────────────────────────
+
+    def remove_ids(self, ids) -> int:
+        """
+        Removes vectors (and their metadata) by FAISS id; returns how many ids
+        had metadata. Flat and IVF indexes drop the vectors at once. HNSW keeps
+        them as tombstones, masked out of searches until the next rebuild.
+        """
+        ids = np.unique(np.asarray(list(ids), dtype=np.int64))
+        if not len(ids):
+            return 0
+        try:
+            with self.process_lock, self.lock.write_lock():
+                self._catch_up()
+                self._append_wal({"remove": ids})
+                removed = self._remove(ids)
+                self._update_filter_bitmaps(removed=ids)
+                self.generation += 1
+                self._last_write = time.monotonic()
+            logger.info(f"Removed {removed} vectors from index.")
+        except Exception as e:
+            logger.error(f"Error removing vectors from index: {e}")
+            return 0
+        self._maybe_compact()
+        self._maybe_migrate()
+        return removed
+
+    def _remove(self, ids: np.ndarray) -> int:
+        migration_removed = self._migration_removed
+        if migration_removed is not None:
+            migration_removed.append(ids)
+        removed = self.store.remove(ids)
+        if self._can_remove(self.index):
+            self._make_writable()
+            self.index.remove_ids(ids)
+        else:
+            self._tombstones = self.index.ntotal - self.store.count()
+        return removed
+
+    def remove_document(self, filename: str) -> int:
+        """Removes every vector indexed for `filename`; returns the count."""
+        return self.remove_ids(self.store.ids_for_filename(filename))
+
+    def remove_path(self, path) -> int:
+        """Removes the vectors indexed from the file at `path`; returns the count."""
+        return self.remove_ids(self.store.ids_for_path(path))
+
+    def remove_source_url(self, source_url: str) -> int:
+        """Removes every vector indexed from `source_url` (e.g. a crawled page); returns the count."""
+        return self.remove_ids(self.store.ids_for_source_url(source_url))
+
+    # ── batched writes ────────────────────────────────────────────────────────
+
+    def _batch_state(self):
+        state = self._batches
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.flush_size = self.batch_flush_size
+            state.vectors = []
+            state.metadata = []
+            state.pending = 0
+        return state
+
+    def _flush_batch(self, state):
+        if not state.pending:
+            return
+        vectors = state.vectors[0] if len(state.vectors) == 1 else np.vstack(state.vectors)
+        metadata = state.metadata
+        state.vectors, state.metadata, state.pending = [], [], 0
+        self._commit(vectors, metadata)
+
+    def flush(self):
+        """Commits the vectors buffered by the current thread's `batch()` now."""
+        self._flush_batch(self._batch_state())
+
+    @contextmanager
+    def batch(self, flush_size: Optional[int] = None):
+        """
+        Buffers `add_documents`/`add_single_document` calls made by the current
+        thread and commits them with one `index.add` and one log append on exit:
+
+            with indexer.batch():
+                indexer.add_single_document(emb, meta)
+                indexer.add_documents(embs, metas)
+
+        Buffers are flushed early every `flush_size` vectors so memory stays
+        bounded. Nested batches commit when the outermost one exits; if it exits
+        with an exception the unflushed buffer is discarded.
+        """
+        state = self._batch_state()
+        if state.depth == 0 and flush_size:
+            state.flush_size = flush_size
+        state.depth += 1
+        try:
+            yield self
+        except BaseException:
+            state.depth -= 1
+            if state.depth == 0:
+                if state.pending:
+                    logger.warning(f"Discarding {state.pending} buffered vectors after failed batch.")
+                state.vectors, state.metadata, state.pending = [], [], 0
+                state.flush_size = self.batch_flush_size
+            raise
+        state.depth -= 1
+        if state.depth == 0:
+            self._flush_batch(state)
+            state.flush_size = self.batch_flush_size
+
+    # ── filtered search ───────────────────────────────────────────────────────
+
+    def _filter_bitmap(self, filters: Dict) -> np.ndarray:
+        """
+        Returns the ids matching `filters` as a little-endian bitmap (bit i set
+        when id i matches). Built once per filter from the metadata store, then
+        kept current by `_update_filter_bitmaps` on every add and removal.
+        """
+        key = json.dumps(filters, sort_keys=True, default=str)
+        entry = self._selector_cache.get(key)
+        if entry is None:
+            ids = np.fromiter(self.store.ids_matching(filters), dtype=np.int64)
+            mask = np.zeros(self.next_id, dtype=bool)
+            mask[ids[ids < self.next_id]] = True
+            entry = (filters, np.packbits(mask, bitorder="little"))
+            with self._selector_lock:
+                if len(self._selector_cache) >= self._selector_cache_size:
+                    self._selector_cache.pop(next(iter(self._selector_cache)))
+                self._selector_cache[key] = entry
+        return entry[1]
+
+    def _update_filter_bitmaps(self, added_from: Optional[int] = None, removed: Optional[np.ndarray] = None):
+        """
+        Patches the cached filter bitmaps after a write, under the write lock:
+        bits of `removed` ids are cleared, and the maps grow to `next_id` with
+        the bits of the ids added from `added_from` on set where they match.
+        Only the new ids are looked up, so a write costs O(batch), not O(N).
+        """
+        with self._selector_lock:
+            size = (self.next_id + 7) // 8
+            for key, (filters, bitmap) in list(self._selector_cache.items()):
+                if removed is not None and len(removed):
+                    ids = removed[removed < len(bitmap) * 8]
+                    np.bitwise_and.at(bitmap, ids >> 3, ~np.left_shift(np.uint8(1), (ids & 7).astype(np.uint8)))
+                if added_from is not None:
+                    if len(bitmap) < size:
+                        # Doubling keeps growth amortized; bits past next_id stay clear
+                        grown = np.zeros(max(size, 2 * len(bitmap)), dtype=np.uint8)
+                        grown[:len(bitmap)] = bitmap
+                        bitmap = grown
+                    ids = np.fromiter(self.store.ids_matching(filters, min_id=added_from), dtype=np.int64)
+                    ids = ids[ids < self.next_id]
+                    np.bitwise_or.at(bitmap, ids >> 3, np.left_shift(np.uint8(1), (ids & 7).astype(np.uint8)))
+                self._selector_cache[key] = (filters, bitmap)
+
+    def _search_params(self, selector):
+        kind = self._index_kind(self.index)
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def search(self, query_vector: np.ndarray, k: int = 5, filters: Optional[Dict] = None) -> Tuple[List[Dict], List[float]]:
         """
         Searches the index for the k nearest neighbors.
-        Returns a tuple of (metadata_list, distances).
-        """
-        if self.index.ntotal == 0:
-            return [], []
-
-        distances, indices = self.index.search(query_vector, k)
-        
-        results = []
-        result_distances = []
-        
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and idx < len(self.metadata):
-                results.append(self.metadata[idx])
-                result_distances.append(distances[0][i])
-                
-        return results, result_distances
-
-    def _save_index(self):
+        Returns a tuple of (metadata_list, distances); with the "ip" metric the
+        distances are cosine similarities (higher is closer).
+
+        `filters` (see `MetadataStore.ids_matching`) restrict the candidates inside
+        the FAISS scan through an id selector, so a rare category still yields up
+        to k results instead of whatever survives a post-filter.
+        """
+        if len(query_vector.shape) == 1:
+            query_vector = query_vector.reshape(1, -1)
+        return self.search_many(query_vector[:1], k, filters)[0]
+
+    def search_many(self, query_vectors: np.ndarray, k: int = 5, filters: Optional[Dict] = None) -> List[Tuple[List[Dict], List[float]]]:
+        """
+        Searches an (n, dim) matrix of queries with a single `index.search` call
+        and one metadata lookup. Returns one (metadata_list, distances) pair per
+        query, in order; `filters` apply to every query.
+        """
+        query_vectors = self._prepare(query_vectors)
+        empty = [([], []) for _ in range(len(query_vectors))]
+        with self.lock.read_lock():
+            if self.index.ntotal == 0:
+                return empty
+
+            rerank = self.vectors is not None and self.active_compression in LOSSY_COMPRESSIONS
+            fetch = k * self.rerank_factor if rerank else k
+            # Tombstones are masked out like a filter that matches every live id
+            if filters or self._tombstones:
+                bitmap = self._filter_bitmap(filters or {})
+                if not bitmap.any():
+                    return empty
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                distances, indices = self.index.search(query_vectors, fetch, params=self._search_params(selector))
+            else:
+                distances, indices = self.index.search(query_vectors, fetch)
+            if rerank:
+                distances, indices = self._rerank(query_vectors, indices, k)
+
+        # Only the rows for the returned ids are read from the metadata store
+        records = self.store.get(np.unique(indices[indices != -1]).tolist())
+        batch_results = []
+        for row_ids, row_distances in zip(indices, distances):
+            results = []
+            result_distances = []
+            for idx, dist in zip(row_ids, row_distances):
+                record = records.get(int(idx))
+                if record is not None:
+                    # Copy so repeated hits across queries can be annotated independently
+                    results.append(dict(record))
+                    result_distances.append(dist)
+            batch_results.append((results, result_distances))
+        return batch_results
+
+    def _rerank(self, query_vectors: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-scores (n, k * rerank_factor) candidates from a compressed index against
+        the exact vectors and keeps the best k per query, with the same score
+        semantics as an uncompressed index (inner product, or squared L2).
+        """
+        valid = indices != -1
+        candidates = self.vectors.get(np.where(valid, indices, 0))
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            scores = np.einsum("nkd,nd->nk", candidates, query_vectors)
+            scores[~valid] = -np.inf
+            order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        else:
+            scores = ((candidates - query_vectors[:, None, :]) ** 2).sum(axis=2)
+            scores[~valid] = np.inf
+            order = np.argsort(scores, axis=1, kind="stable")[:, :k]
+        indices = np.take_along_axis(indices, order, axis=1)
+        distances = np.take_along_axis(scores, order, axis=1).astype(np.float32)
+        return distances, indices
+
+    # ── write-ahead log ───────────────────────────────────────────────────────
+
+    def _open_wal(self):
+        self._wal = open(self.wal_file, "ab")
+        self._wal_bytes = self._wal.tell()
+
+    def _close_wal(self):
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def _append_wal(self, record: Dict):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._wal.write(WAL_HEADER.pack(len(payload)) + payload)
+        self._wal.flush()
+        if self.wal_fsync:
+            os.fsync(self._wal.fileno())
+        self._wal_bytes += WAL_HEADER.size + len(payload)
+        self._disk_state = self._read_disk_state()
+
+    def _read_wal(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Returns the intact records after `offset` and the offset where they end."""
+        records = []
+        if not self.wal_file.exists():
+            return records, offset
+        with open(self.wal_file, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(WAL_HEADER.size)
+                if len(header) < WAL_HEADER.size:
+                    break
+                (length,) = WAL_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+                try:
+                    records.append(pickle.loads(payload))
+                except Exception as e:
+                    logger.error(f"Corrupt WAL record at offset {offset}: {e}")
+                    break
+                offset += WAL_HEADER.size + length
+        return records, offset
+
+    def _replay_wal(self):
+        records, good_offset = self._read_wal()
+        replayed = 0
+        # Ids below this were assigned before the snapshot was taken
+        snapshot_next_id = self.next_id
+        for rec in records:
+            if "remove" in rec:
+                # Removing absent ids is a no-op, so replaying removals is idempotent
+                self._remove(rec["remove"])
+                continue
+            start, vectors = rec["start"], rec["vectors"]
+            # Records already folded into the snapshot are skipped, which makes
+            # replay idempotent if a crash interrupted compaction. A record may
+            # start past the snapshot when the vectors before it were removed.
+            skip = max(0, snapshot_next_id - start)
+            if skip >= len(vectors):
+                continue
+            ids = np.arange(start + skip, start + len(vectors), dtype=np.int64)
+            if not self._has_ids(self.index) and ids[0] != self.index.ntotal:
+                logger.error(f"WAL gap at vector {self.index.ntotal} (record starts at {ids[0]}); stopping replay.")
+                break
+            self._add_vectors(vectors[skip:], ids)
+            self.next_id = max(self.next_id, start + len(vectors))
+            if rec.get("metadata"):
+                # Logs written before the SQLite store carried metadata inline
+                self.store.add(start + skip, rec["metadata"][skip:])
+            replayed += len(vectors) - skip
+
+        if self.wal_file.exists() and good_offset < self.wal_file.stat().st_size:
+            logger.warning(f"Discarding torn WAL tail after offset {good_offset}.")
+            with open(self.wal_file, "r+b") as f:
+                f.truncate(good_offset)
+        if replayed:
+            logger.info(f"Replayed {replayed} vectors from write-ahead log.")
+
+    # ── other processes ───────────────────────────────────────────────────────
+
+    def _read_disk_state(self) -> Tuple:
         try:
-            faiss.write_index(self.index, str(self.index_file))
-            with open(self.metadata_file, "wb") as f:
-                pickle.dump(self.metadata, f)
-            logger.info("Index and metadata saved to disk.")
+            st = self.index_file.stat()
+            snapshot = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            snapshot = None
+        try:
+            st = self.wal_file.stat()
+            wal = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            wal = None
+        return snapshot, wal
+
+    def _catch_up(self) -> bool:
+        """
+        Applies what other processes wrote to the index directory since this one
+        last looked; called with the process and write locks held. Records
+        appended to the same log are replayed (their metadata is already in the
+        shared store); a new snapshot or log (compaction, clear) means a full
+        reload, and True is returned.
+        """
+        state = self._read_disk_state()
+        if state == self._disk_state:
+            return False
+        (seen_snapshot, seen_wal), (snapshot, wal) = self._disk_state, state
+        if snapshot != seen_snapshot or wal is None or seen_wal is None or wal[0] != seen_wal[0] or wal[1] < seen_wal[1]:
+            logger.info("Index was rewritten by another process; reloading.")
+            self._load_locked()
+            return True
+
+        records, end = self._read_wal(self._wal_bytes)
+        added_from, removed = None, []
+        for rec in records:
+            if "remove" in rec:
+                self._remove(rec["remove"])
+                removed.append(rec["remove"])
+                continue
+            start, vectors = rec["start"], rec["vectors"]
+            self._add_vectors(vectors, np.arange(start, start + len(vectors), dtype=np.int64))
+            self.next_id = max(self.next_id, start + len(vectors))
+            added_from = start if added_from is None else min(added_from, start)
+        self._wal_bytes = end
+        self._tombstones = self.index.ntotal - self.store.count()
+        self._update_filter_bitmaps(
+            added_from=added_from,
+            removed=np.concatenate(removed).astype(np.int64) if removed else None,
+        )
+        self.generation += 1
+        self._last_write = time.monotonic()
+        self._disk_state = self._read_disk_state()
+        logger.info(f"Applied {len(records)} log records written by another process.")
+        return False
+
+    # ── compaction ────────────────────────────────────────────────────────────
+
+    def _maybe_compact(self):
+        due = self._wal_bytes >= self.wal_max_bytes or (
+            self._wal_bytes > 0 and time.monotonic() - self._last_compaction >= self.compact_interval
+        )
+        if due:
+            self._start_compaction()
+        else:
+            self._schedule_compaction()
+
+    def _start_compaction(self):
+        with self._compaction_guard:
+            if self._closed:
+                return
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(
+                target=self.compact, name="faiss-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+
+    def _schedule_compaction(self):
+        """
+        Arms the timer that compacts a non-empty log once compact_interval has
+        passed, or maps the compacted snapshot again once writes have stopped
+        for that long.
+        """
+        with self._compaction_guard:
+            if self._closed or self._compaction_timer is not None:
+                return
+            thread = self._compaction_thread
+            if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+                # The running compaction re-arms the timer when it finishes
+                return
+            if self._wal_bytes:
+                due = self._last_compaction + self.compact_interval
+            elif self._can_remap():
+                due = self._last_write + self.compact_interval
+            else:
+                return
+            delay = due - time.monotonic()
+            self._compaction_timer = threading.Timer(
+                min(max(delay, 0.0), threading.TIMEOUT_MAX), self._on_compaction_timer
+            )
+            self._compaction_timer.name = "faiss-compaction-timer"
+            self._compaction_timer.daemon = True
+            self._compaction_timer.start()
+
+    def _on_compaction_timer(self):
+        with self._compaction_guard:
+            self._compaction_timer = None
+        if self._wal_bytes:
+            self._maybe_compact()
+        else:
+            self._maybe_remap()
+
+    def _can_remap(self) -> bool:
+        return self.mmap and not self._mapped and self.generation == self._snapshot_generation
+
+    def _maybe_remap(self):
+        """Serves the snapshot from the page cache again once writes have stopped for compact_interval."""
+        if time.monotonic() - self._last_write < self.compact_interval:
+            self._schedule_compaction()
+            return
+        with self.process_lock, self.lock.write_lock():
+            # Records from other processes make the snapshot stale again
+            self._catch_up()
+            if self._can_remap():
+                self._remap()
+        self._schedule_compaction()
+
+    def compact(self):
+        """
+        Folds the write-ahead log into a fresh snapshot.
+        The in-memory state is copied under the read lock, so searches continue and
+        writers only wait for that copy; they keep appending to the log while the
+        snapshot is written to disk. The snapshot and log are swapped under the
+        process lock, unless another process rewrote them in the meantime.
+        """
+        with self.process_lock:
+            with self.lock.write_lock():
+                # The snapshot must include what other processes logged
+                self._catch_up()
+            with self.lock.read_lock():
+                snapshot = self.index
+                index_bytes = faiss.serialize_index(snapshot)
+                count = snapshot.ntotal
+                wal_offset = self._wal_bytes
+                reloads = self._reloads
+                generation = self.generation
+
+        try:
+            if self.vectors is not None:
+                # Rows for the vectors folded into the snapshot must survive a crash
+                # once the log records that would rewrite them are dropped
+                self.vectors.sync()
+            index_tmp = self._write_snapshot(index_bytes)
         except Exception as e:
+            logger.error(f"Compaction failed, keeping write-ahead log: {e}")
+            # Retry after another interval rather than on every timer tick
+            self._last_compaction = time.monotonic()
+            self._schedule_compaction()
+            return
+
+        with self.process_lock, self.lock.write_lock():
+            if self._catch_up() or self._reloads != reloads:
+                # Another process compacted or cleared the index meanwhile, so the
+                # snapshot is stale and wal_offset points into a different log
+                index_tmp.unlink(missing_ok=True)
+                logger.info("Index was rewritten by another process; discarding this compaction.")
+                self._last_compaction = time.monotonic()
+                return
+            os.replace(index_tmp, self.index_file)
+            # Carry over only the records appended while the snapshot was written
+            tail = b""
+            with open(self.wal_file, "rb") as f:
+                f.seek(wal_offset)
+                tail = f.read()
+            self._close_wal()
+            tmp = self.wal_file.with_suffix(".log.tmp")
+            tmp.write_bytes(tail)
+            os.replace(tmp, self.wal_file)
+            self._open_wal()
+            self._disk_state = self._read_disk_state()
+            self._last_compaction = time.monotonic()
+            if not tail and self.generation == generation:
+                # Nothing changed since the snapshot; the timer maps it in place of
+                # the private copy once writes have been quiet for a while
+                self._snapshot_generation = generation
+        logger.info(f"Compacted index snapshot ({count} vectors, {len(tail)} WAL bytes carried over).")
+        # Records carried over are compacted (or a quiet snapshot mapped) in due course
+        self._schedule_compaction()
+
+    def _remap(self):
+        try:
+            index = faiss.read_index(str(self.index_file), MMAP_FLAG)
+            self._enable_reconstruct(index)
+            self._apply_search_params(index)
+        except Exception as e:
+            logger.warning(f"Could not memory-map the new snapshot: {e}")
+            return
+        self.index = index
+        self._mapped = True
+
+    def _write_snapshot(self, index_bytes: np.ndarray) -> Path:
+        """Writes a snapshot beside the current one, to be swapped in atomically; returns its path."""
+        # Named per process: another one may be compacting the same index
+        index_tmp = self.index_file.with_suffix(f".bin.{os.getpid()}.tmp")
+        try:
+            with open(index_tmp, "wb") as f:
+                f.write(index_bytes.tobytes())
+        except Exception as e:
+            index_tmp.unlink(missing_ok=True)
             logger.error(f"Error saving index: {e}")
+            raise
+        return index_tmp
 
     def add_single_document(self, embedding: np.ndarray, doc_metadata: Dict):
         """
@@ -89,20 +1203,77 @@ class FaissIndexer:
         # Ensure 2D array (1, dim)
         if len(embedding.shape) == 1:
             embedding = embedding.reshape(1, -1)
-            
+
         self.add_documents(embedding, [doc_metadata])
 
+    def _wait_for_compaction(self):
+        thread = self._compaction_thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join()
+
+    def close(self):
+        """
+        Waits for any running compaction and closes the log. Un-compacted records
+        stay in the log and are replayed (and compacted) on the next load.
+        """
+        with self._compaction_guard:
+            self._closed = True
+            if self._compaction_timer is not None:
+                self._compaction_timer.cancel()
+                self._compaction_timer = None
+        self._wait_for_compaction()
+        with self.lock.write_lock():
+            self._close_wal()
+            if self.vectors is not None:
+                self.vectors.close()
+                self.vectors = None
+
     def clear(self):
         """
         Clears the in-memory index and metadata, and removes persisted files if they exist.
         """
         try:
-            self._create_new_index()
-            # Remove on-disk files
-            if self.index_file.exists():
-                self.index_file.unlink()
-            if self.metadata_file.exists():
-                self.metadata_file.unlink()
+            self._wait_for_compaction()
+            with self.process_lock, self.lock.write_lock():
+                self._close_wal()
+                self._create_new_index()
+                self.store.clear()
+                if self.vectors is not None:
+                    self.vectors.clear()
+                self.next_id = 0
+                self._tombstones = 0
+                self._selector_cache.clear()
+                self.generation += 1
+                # Remove on-disk files
+                for path in (self.index_file, self.legacy_metadata_file, self.wal_file):
+                    if path.exists():
+                        path.unlink()
+                self._open_wal()
+                self._disk_state = self._read_disk_state()
+                self._reloads += 1
             logger.info("Cleared FAISS index and metadata.")
         except Exception as e:
             logger.error(f"Error clearing index: {e}")
+
+
+# ── process-wide registry ─────────────────────────────────────────────────────
+
+_shared_indexers: Dict[Path, FaissIndexer] = {}
+_shared_indexers_lock = threading.Lock()
+
+def get_shared_indexer(index_path: Path, config: Optional[Dict] = None) -> FaissIndexer:
+    """
+    Returns the single in-process FaissIndexer for `index_path`, creating it on
+    first use. SearchEngine, DocumentProcessor and the crawl job all write through
+    this instance, so new vectors are searchable as soon as they are added and
+    nothing needs to be reloaded from disk.
+    """
+    key = Path(index_path).resolve()
+    indexer = _shared_indexers.get(key)
+    if indexer is None:
+        with _shared_indexers_lock:
+            indexer = _shared_indexers.get(key)
+            if indexer is None:
+                indexer = FaissIndexer.from_config(key, config)
+                _shared_indexers[key] = indexer
+    return indexer
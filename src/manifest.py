@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .utils import setup_logging
+
+logger = setup_logging("Ingest_Manifest")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path         TEXT PRIMARY KEY,
+    filename     TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    mtime        REAL NOT NULL,
+    sha256       TEXT NOT NULL,
+    first_id     INTEGER,
+    last_id      INTEGER,
+    vector_count INTEGER NOT NULL,
+    indexed_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
+"""
+
+class IngestManifest:
+    """
+    What was ingested from each source file: (path, size, mtime, content hash)
+    -> FAISS id range. `SearchEngine.ingest_new_files` diffs the raw directory
+    against it to find new, changed and deleted files.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def entries(self) -> Dict[str, Dict]:
+        """{path: entry} for every recorded file."""
+        rows = self._conn().execute("SELECT * FROM files").fetchall()
+        return {row["path"]: dict(row) for row in rows}
+
+    def record(self, path: Path, sha256: str, ids: List[int], stat=None):
+        stat = stat or Path(path).stat()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, filename, size, mtime, sha256, first_id, last_id, vector_count, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(path), Path(path).name, stat.st_size, stat.st_mtime, sha256,
+                 min(ids) if ids else None, max(ids) if ids else None, len(ids), time.time()),
+            )
+
+    def touch(self, path: Path, stat):
+        """Updates size/mtime for a file whose content hash did not change."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime, str(path)),
+            )
+
+    def remove(self, path: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM files WHERE path = ?", (str(path),))
+
+    def unindexed_copies(self, sha256: str) -> List[str]:
+        """Paths recorded with this content but no vectors (skipped as duplicates)."""
+        rows = self._conn().execute(
+            "SELECT path FROM files WHERE sha256 = ? AND vector_count = 0", (sha256,)
+        ).fetchall()
+        return [row["path"] for row in rows]
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM files")
+
+    def close(self):
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
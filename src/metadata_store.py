@@ -0,0 +1,345 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+from .utils import setup_logging
+
+logger = setup_logging("Metadata_Store")
+
+# Per-vector fields; everything else in a metadata record is document-level and
+# stored once per document instead of being copied onto every chunk.
+CHUNK_FIELDS = ("type", "id", "content_snippet")
+# Optional per-vector fields, kept as JSON in `vectors.extra`
+CHUNK_EXTRA_FIELDS = ("page",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id      INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    filename    TEXT,
+    fields      TEXT NOT NULL,
+    domain      TEXT,
+    ingest_date TEXT,
+    source_url  TEXT,
+    path        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents(filename);
+
+-- Inverted list category -> documents, used to pre-filter searches
+CREATE TABLE IF NOT EXISTS document_categories (
+    doc_id   INTEGER NOT NULL REFERENCES documents(doc_id),
+    category TEXT NOT NULL,
+    PRIMARY KEY (category, doc_id)
+);
+
+CREATE TABLE IF NOT EXISTS vectors (
+    faiss_id        INTEGER PRIMARY KEY,
+    doc_id          INTEGER NOT NULL REFERENCES documents(doc_id),
+    type            TEXT,
+    record_id       TEXT,
+    content_snippet TEXT,
+    extra           TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_vectors_doc ON vectors(doc_id);
+CREATE INDEX IF NOT EXISTS idx_vectors_type ON vectors(type);
+
+-- 'next_id': one past the highest FAISS id ever stored, so removing the newest
+-- vectors does not hand their ids out again
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Filter columns added after the first release of the store
+FILTER_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_documents_domain ON documents(domain);
+CREATE INDEX IF NOT EXISTS idx_documents_ingest_date ON documents(ingest_date);
+CREATE INDEX IF NOT EXISTS idx_documents_source_url ON documents(source_url);
+CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path);
+"""
+
+
+def source_path(path: Optional[Union[str, Path]]) -> Optional[str]:
+    """Normalizes a document's source path so relative and absolute spellings match."""
+    if not path:
+        return None
+    return str(Path(path).resolve())
+
+
+class MetadataStore:
+    """
+    SQLite-backed metadata for FAISS vectors, keyed by FAISS id.
+
+    Document-level fields (summary, headings, keywords, dates, ...) live in the
+    `documents` table once per document; `vectors` holds only the chunk-level
+    fields. Nothing is loaded up front: `get` materializes just the rows a
+    search returns.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate_schema(conn)
+            conn.executescript(FILTER_INDEXES)
+
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "domain" not in columns:
+            logger.info("Adding filter columns to metadata store...")
+            conn.execute("ALTER TABLE documents ADD COLUMN domain TEXT")
+            conn.execute("ALTER TABLE documents ADD COLUMN ingest_date TEXT")
+            for doc_id, fields in conn.execute("SELECT doc_id, fields FROM documents").fetchall():
+                doc_fields = json.loads(fields)
+                conn.execute(
+                    "UPDATE documents SET domain = ?, ingest_date = ? WHERE doc_id = ?",
+                    (doc_fields.get("domain"), doc_fields.get("ingest_date"), doc_id),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO document_categories (doc_id, category) VALUES (?, ?)",
+                    [(doc_id, c) for c in doc_fields.get("categories") or []],
+                )
+        if "source_url" not in columns:
+            logger.info("Adding source_url column to metadata store...")
+            conn.execute("ALTER TABLE documents ADD COLUMN source_url TEXT")
+            for doc_id, fields in conn.execute("SELECT doc_id, fields FROM documents").fetchall():
+                source_url = json.loads(fields).get("source_url")
+                if source_url:
+                    conn.execute("UPDATE documents SET source_url = ? WHERE doc_id = ?", (source_url, doc_id))
+        if "path" not in columns:
+            logger.info("Adding path column to metadata store...")
+            conn.execute("ALTER TABLE documents ADD COLUMN path TEXT")
+            for doc_id, fields in conn.execute("SELECT doc_id, fields FROM documents").fetchall():
+                path = source_path(json.loads(fields).get("path"))
+                if path:
+                    conn.execute("UPDATE documents SET path = ? WHERE doc_id = ?", (path, doc_id))
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL mode lets readers run alongside a writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _split(record: Dict):
+        doc_fields = {k: v for k, v in record.items()
+                      if k not in CHUNK_FIELDS and k not in CHUNK_EXTRA_FIELDS and k != "score"}
+        extra = {k: record[k] for k in CHUNK_EXTRA_FIELDS if k in record}
+        fields_json = json.dumps(doc_fields, sort_keys=True, default=str)
+        fingerprint = hashlib.sha1(fields_json.encode("utf-8")).hexdigest()
+        return doc_fields, fields_json, fingerprint, extra
+
+    def add(self, start_id: int, records: Sequence[Dict]):
+        """Stores `records` under consecutive FAISS ids starting at `start_id`."""
+        self.add_with_ids(range(start_id, start_id + len(records)), records)
+
+    def add_with_ids(self, ids: Iterable[int], records: Sequence[Dict]):
+        conn = self._conn()
+        doc_ids: Dict[str, int] = {}
+        rows = []
+        with conn:
+            for faiss_id, record in zip(ids, records):
+                doc_fields, fields_json, fingerprint, extra = self._split(record)
+                doc_id = doc_ids.get(fingerprint)
+                if doc_id is None:
+                    inserted = conn.execute(
+                        "INSERT OR IGNORE INTO documents "
+                        "(fingerprint, filename, fields, domain, ingest_date, source_url, path) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (fingerprint, doc_fields.get("filename"), fields_json,
+                         doc_fields.get("domain"), doc_fields.get("ingest_date"),
+                         doc_fields.get("source_url") or None, source_path(doc_fields.get("path"))),
+                    ).rowcount
+                    doc_id = conn.execute(
+                        "SELECT doc_id FROM documents WHERE fingerprint = ?", (fingerprint,)
+                    ).fetchone()[0]
+                    if inserted:
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO document_categories (doc_id, category) VALUES (?, ?)",
+                            [(doc_id, c) for c in doc_fields.get("categories") or []],
+                        )
+                    doc_ids[fingerprint] = doc_id
+                rows.append((
+                    int(faiss_id), doc_id, record.get("type"), record.get("id"),
+                    record.get("content_snippet"), json.dumps(extra) if extra else None,
+                ))
+            conn.executemany(
+                "INSERT OR REPLACE INTO vectors (faiss_id, doc_id, type, record_id, content_snippet, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if rows:
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('next_id', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (max(row[0] for row in rows) + 1,),
+                )
+
+    def get(self, ids: Sequence[int]) -> Dict[int, Dict]:
+        """Returns {faiss_id: metadata dict} for the ids that exist."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn().execute(
+            "SELECT v.faiss_id, v.type, v.record_id, v.content_snippet, v.extra, d.fields "
+            "FROM vectors v JOIN documents d ON d.doc_id = v.doc_id "
+            f"WHERE v.faiss_id IN ({placeholders})",
+            ids,
+        ).fetchall()
+        results = {}
+        for faiss_id, rtype, record_id, snippet, extra, fields in rows:
+            record = json.loads(fields)
+            record["type"] = rtype
+            record["id"] = record_id
+            record["content_snippet"] = snippet
+            if extra:
+                record.update(json.loads(extra))
+            results[faiss_id] = record
+        return results
+
+    def ids_matching(self, filters: Dict, min_id: Optional[int] = None) -> Iterator[int]:
+        """
+        Yields the FAISS ids whose metadata satisfies every filter:
+            categories: str | list  (any of)
+            type:       str | list  (summary / chunk / web_chunk ...)
+            domain:     str | list
+            date_from / date_to: ISO-8601 bounds on ingest_date (inclusive)
+        `min_id` restricts the scan to ids >= min_id (the ones just added).
+        """
+        clauses, params = [], []
+        if min_id is not None:
+            clauses.append("v.faiss_id >= ?")
+            params.append(int(min_id))
+
+        def any_of(column: str, value):
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+
+        if filters.get("categories"):
+            values = filters["categories"]
+            values = [values] if isinstance(values, str) else list(values)
+            clauses.append(
+                "v.doc_id IN (SELECT doc_id FROM document_categories "
+                f"WHERE category IN ({','.join('?' * len(values))}))"
+            )
+            params.extend(values)
+        if filters.get("type"):
+            any_of("v.type", filters["type"])
+        if filters.get("domain"):
+            any_of("d.domain", filters["domain"])
+        if filters.get("date_from"):
+            clauses.append("d.ingest_date >= ?")
+            params.append(filters["date_from"])
+        if filters.get("date_to"):
+            clauses.append("d.ingest_date <= ?")
+            # A bare date bound includes that whole day
+            date_to = filters["date_to"]
+            params.append(date_to + "T23:59:59.999999" if len(date_to) == 10 else date_to)
+
+        sql = "SELECT v.faiss_id FROM vectors v JOIN documents d ON d.doc_id = v.doc_id"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        for (faiss_id,) in self._conn().execute(sql, params):
+            yield faiss_id
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def next_id(self) -> int:
+        """Lowest FAISS id that was never stored (survives removals, reset by `clear`)."""
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM counters WHERE name = 'next_id'").fetchone()
+        if row is not None:
+            return row[0]
+        # Stores written before the counter existed
+        return conn.execute("SELECT COALESCE(MAX(faiss_id) + 1, 0) FROM vectors").fetchone()[0]
+
+    def filenames(self) -> Set[str]:
+        rows = self._conn().execute(
+            "SELECT DISTINCT filename FROM documents WHERE filename IS NOT NULL"
+        ).fetchall()
+        return {r[0] for r in rows}
+
+    def ids_for_filename(self, filename: str) -> List[int]:
+        rows = self._conn().execute(
+            "SELECT v.faiss_id FROM vectors v JOIN documents d ON d.doc_id = v.doc_id WHERE d.filename = ?",
+            (filename,),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def ids_for_source_url(self, source_url: str) -> List[int]:
+        rows = self._conn().execute(
+            "SELECT v.faiss_id FROM vectors v JOIN documents d ON d.doc_id = v.doc_id WHERE d.source_url = ?",
+            (source_url,),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def ids_for_path(self, path: Union[str, Path]) -> List[int]:
+        """Ids of the vectors indexed from the file at `path` (unlike a filename, unique)."""
+        rows = self._conn().execute(
+            "SELECT v.faiss_id FROM vectors v JOIN documents d ON d.doc_id = v.doc_id WHERE d.path = ?",
+            (source_path(path),),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Deletes the rows for `ids` (and documents left without vectors); returns the count."""
+        conn = self._conn()
+        with conn:
+            deleted = conn.executemany(
+                "DELETE FROM vectors WHERE faiss_id = ?", [(int(i),) for i in ids]
+            ).rowcount
+            if deleted:
+                self._drop_orphan_documents(conn)
+        return max(deleted, 0)
+
+    def drop_from(self, first_id: int):
+        """
+        Drops rows for ids >= `first_id`: metadata committed for vectors whose
+        log records were lost (ids are assigned in order, so they are always
+        the newest).
+        """
+        conn = self._conn()
+        with conn:
+            deleted = conn.execute("DELETE FROM vectors WHERE faiss_id >= ?", (int(first_id),)).rowcount
+            if deleted:
+                self._drop_orphan_documents(conn)
+        if deleted:
+            logger.warning(f"Dropped {deleted} metadata rows with no matching vector.")
+
+    @staticmethod
+    def _drop_orphan_documents(conn: sqlite3.Connection):
+        orphans = "SELECT doc_id FROM documents WHERE doc_id NOT IN (SELECT DISTINCT doc_id FROM vectors)"
+        conn.execute(f"DELETE FROM document_categories WHERE doc_id IN ({orphans})")
+        conn.execute(f"DELETE FROM documents WHERE doc_id IN ({orphans})")
+
+    def import_records(self, records: List[Dict]):
+        """Replaces the store contents with a legacy list of metadata dicts (list index == FAISS id)."""
+        self.clear()
+        self.add(0, records)
+        logger.info(f"Imported {len(records)} legacy metadata records.")
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM vectors")
+            conn.execute("DELETE FROM document_categories")
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM counters")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
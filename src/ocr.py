@@ -1,19 +1,110 @@
+import multiprocessing
+import os
 import pytesseract
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from .utils import setup_logging, clean_text
-import io
 
 logger = setup_logging("OCR_Module")
 
 # Explicitly set Tesseract path for Arch Linux default
 pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
 
+def _render_page(page, dpi: int) -> Image.Image:
+    """Rasterizes a PDF page to grayscale and hands the raw pixels straight to PIL."""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+def _ocr_with_confidence(image: Image.Image) -> Tuple[str, float]:
+    """
+    OCRs `image` once, returning the text (paragraphs separated by blank lines,
+    as `image_to_string` does) and the mean word confidence (0-100).
+    """
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    paragraphs: List[List[str]] = []
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if key not in lines:
+            lines[key] = []
+            if not paragraphs or key[:2] != paragraphs[-1][0]:
+                paragraphs.append([key[:2]])
+            paragraphs[-1].append(key)
+        lines[key].append(word)
+    text = "\n\n".join(
+        "\n".join(" ".join(lines[key]) for key in para[1:]) for para in paragraphs
+    )
+    return text, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+def _ocr_page(page, dpi: int, adaptive_dpi: bool, min_dpi: int, min_confidence: float) -> str:
+    if adaptive_dpi and min_dpi < dpi:
+        # Most scans read fine at low resolution; only escalate when Tesseract is unsure
+        text, confidence = _ocr_with_confidence(_render_page(page, min_dpi))
+        if confidence >= min_confidence:
+            return text
+        logger.info(
+            f"Page {page.number + 1}: OCR confidence {confidence:.0f} at {min_dpi} DPI, retrying at {dpi} DPI"
+        )
+    return pytesseract.image_to_string(_render_page(page, dpi))
+
+def _ocr_pdf_pages(pdf_path: str, page_numbers: List[int], settings: Dict) -> List[str]:
+    """Process-pool entry point: OCRs the given pages of one PDF."""
+    with fitz.open(pdf_path) as doc:
+        return [_ocr_page(doc[n], **settings) for n in page_numbers]
+
 class OCREngine:
-    def __init__(self):
+    def __init__(
+        self,
+        dpi: int = 300,
+        adaptive_dpi: bool = False,
+        min_dpi: int = 150,
+        min_confidence: float = 60.0,
+        page_workers: int = 0,
+    ):
+        """
+        Args:
+            dpi: Resolution scanned PDF pages are rasterized at.
+            adaptive_dpi: OCR at `min_dpi` first and re-run at `dpi` only when
+                          the mean word confidence is below `min_confidence`.
+            page_workers: Processes OCRing the scanned pages of one PDF in
+                          parallel (0 = one per CPU core, 1 = in-process).
+        """
         logger.info("Initializing OCR Engine (Tesseract + PyMuPDF)...")
+        self.dpi = dpi
+        self.adaptive_dpi = adaptive_dpi
+        self.min_dpi = min_dpi
+        self.min_confidence = min_confidence
+        self.page_workers = page_workers or os.cpu_count() or 1
+        self._page_pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict], **overrides) -> "OCREngine":
+        ocr_cfg = dict((config or {}).get("ocr", {}) or {})
+        ocr_cfg.update(overrides)
+        return cls(
+            dpi=int(ocr_cfg.get("dpi", 300)),
+            adaptive_dpi=bool(ocr_cfg.get("adaptive_dpi", False)),
+            min_dpi=int(ocr_cfg.get("min_dpi", 150)),
+            min_confidence=float(ocr_cfg.get("min_confidence", 60)),
+            page_workers=int(ocr_cfg.get("page_workers", 0)),
+        )
+
+    @property
+    def page_settings(self) -> Dict:
+        return {
+            "dpi": self.dpi,
+            "adaptive_dpi": self.adaptive_dpi,
+            "min_dpi": self.min_dpi,
+            "min_confidence": self.min_confidence,
+        }
 
     def process_file(self, file_path: Path) -> Dict[str, Any]:
         """
@@ -59,30 +150,80 @@ class OCREngine:
     def _process_pdf(self, pdf_path: Path) -> Dict[str, Any]:
         doc = fitz.open(pdf_path)
         full_text = []
+        scanned = []
 
         for page_num, page in enumerate(doc):
             # First try extracting text directly (for digital PDFs)
             text = page.get_text()
             
-            # If little to no text found, try OCR on the page image (scanned PDF)
+            # If little to no text found, OCR the page image (scanned PDF)
             if len(text.strip()) < 10: 
-                logger.info(f"Page {page_num + 1} of {pdf_path.name} appears scanned. Using OCR...")
-                pix = page.get_pixmap(dpi=300)
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                text = pytesseract.image_to_string(image)
-            
+                scanned.append(page_num)
             full_text.append(text)
 
+        if scanned:
+            logger.info(f"{len(scanned)} page(s) of {pdf_path.name} appear scanned. Using OCR...")
+            for page_num, text in zip(scanned, self._ocr_pages(doc, pdf_path, scanned)):
+                full_text[page_num] = text
+
         doc.close()
-        
-        combined_text = "\n".join(full_text)
-        clean_content = clean_text(combined_text)
+
+        # Clean page by page: joining the cleaned pages with single spaces gives
+        # exactly clean_text of the whole document, and tells us where each page starts
+        pages = [clean_text(text) for text in full_text]
+        page_starts, offset = [], 0
+        for text in pages:
+            page_starts.append(offset)
+            if text:
+                offset += len(text) + 1
+        clean_content = " ".join(text for text in pages if text)
 
         return {
             "filename": pdf_path.name,
             "path": str(pdf_path),
             "type": "pdf",
             "content": clean_content,
-            "page_count": len(full_text)
+            "page_count": len(full_text),
+            "page_starts": page_starts,
         }
+
+    def _ocr_pages(self, doc, pdf_path: Path, page_numbers: List[int]) -> List[str]:
+        workers = min(self.page_workers, len(page_numbers))
+        if workers <= 1:
+            return [_ocr_page(doc[n], **self.page_settings) for n in page_numbers]
+
+        # Tesseract is single-threaded per page; spread pages over processes.
+        # Pages are striped so each worker gets a mix of the document.
+        if self._page_pool is None:
+            self._page_pool = ProcessPoolExecutor(
+                max_workers=self.page_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        groups = [page_numbers[i::workers] for i in range(workers)]
+        futures = [
+            self._page_pool.submit(_ocr_pdf_pages, str(pdf_path), group, self.page_settings)
+            for group in groups
+        ]
+        texts = {}
+        for group, future in zip(groups, futures):
+            texts.update(zip(group, future.result()))
+        return [texts[n] for n in page_numbers]
+
+    def close(self):
+        if self._page_pool is not None:
+            self._page_pool.shutdown()
+            self._page_pool = None
+
+
+# One engine per worker process, created on first use
+_process_engine: Optional[OCREngine] = None
+
+def extract_file(path: str, ocr_options: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Module-level entry point for process pools: extracts `path` with this
+    process's OCREngine. Kept here so spawned workers only import the OCR stack.
+    `ocr_options` are OCREngine keyword arguments, used on first call.
+    """
+    global _process_engine
+    if _process_engine is None:
+        _process_engine = OCREngine(**(ocr_options or {}))
+    return _process_engine.process_file(Path(path))
@@ -0,0 +1,160 @@
+import inspect
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from .utils import setup_logging
+
+logger = setup_logging("ONNX_Encoder")
+
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_qint8.onnx"
+CONFIG_FILE = "encoder.json"
+# Tokenizer outputs the exported graph may take, in argument order
+MODEL_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+_export_lock = threading.Lock()
+
+def export_dir_for(models_dir: Path, model_name: str) -> Path:
+    """Directory holding the ONNX export of `model_name` (a hub id or a local path)."""
+    slug = re.sub(r'[^\w.-]+', '_', model_name.strip('/\\')).strip('_')
+    return Path(models_dir) / f"{slug}-onnx"
+
+def export_model(model_name: str, export_dir: Path) -> Path:
+    """
+    Exports the SentenceTransformer `model_name` (transformer, pooling and
+    normalization, i.e. the whole `encode` graph) to `export_dir/model.onnx`,
+    next to its tokenizer. Done once; later loads reuse the files. The export
+    is written to a temporary directory and renamed into place, so a process
+    never sees a half-written model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    export_dir = Path(export_dir)
+    with _export_lock:
+        if (export_dir / MODEL_FILE).exists():
+            return export_dir
+        logger.info(f"Exporting {model_name} to ONNX in {export_dir}...")
+        model = SentenceTransformer(model_name, device="cpu")
+        model.eval()
+        tokenizer = model.tokenizer
+        # Two texts of different lengths, so padding and the attention mask are traced
+        sample = tokenizer(["An example notice about exams.", "Fees"], padding=True, return_tensors="pt")
+        input_names = [name for name in MODEL_INPUTS if name in sample]
+
+        class Graph(torch.nn.Module):
+            def __init__(self, st_model):
+                super().__init__()
+                self.st_model = st_model
+
+            def forward(self, *inputs):
+                return self.st_model(dict(zip(input_names, inputs)))["sentence_embedding"]
+
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["sentence_embedding"] = {0: "batch"}
+        # torch >= 2.5 defaults to the dynamo exporter (needs onnxscript); the
+        # TorchScript exporter handles these models without extra packages
+        options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+        export_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{export_dir.name}-", dir=export_dir.parent))
+        try:
+            # TracerWarnings about Python-level shape checks are expected here
+            with torch.no_grad(), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                torch.onnx.export(
+                    Graph(model),
+                    tuple(sample[name] for name in input_names),
+                    str(staging / MODEL_FILE),
+                    input_names=input_names,
+                    output_names=["sentence_embedding"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=17,
+                    **options,
+                )
+            tokenizer.save_pretrained(str(staging))
+            (staging / CONFIG_FILE).write_text(json.dumps({
+                "model_name": model_name,
+                "max_seq_length": model.max_seq_length,
+                "input_names": input_names,
+            }, indent=2))
+            if export_dir.exists():
+                shutil.rmtree(export_dir)
+            os.replace(staging, export_dir)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    logger.info(f"Exported {model_name} to {export_dir / MODEL_FILE}")
+    return export_dir
+
+def quantize_model(export_dir: Path) -> Path:
+    """Writes `model_qint8.onnx`: dynamic int8 quantization of the exported model's weights."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    export_dir = Path(export_dir)
+    target = export_dir / INT8_MODEL_FILE
+    with _export_lock:
+        if target.exists():
+            return target
+        logger.info(f"Quantizing {export_dir / MODEL_FILE} to int8...")
+        staging = export_dir / f".{INT8_MODEL_FILE}.tmp"
+        try:
+            quantize_dynamic(str(export_dir / MODEL_FILE), str(staging), weight_type=QuantType.QInt8)
+            os.replace(staging, target)
+        finally:
+            staging.unlink(missing_ok=True)
+    return target
+
+class OnnxEncoder:
+    """
+    Runs an exported SentenceTransformer with ONNX Runtime on the CPU. Mirrors
+    `SentenceTransformer.encode`: texts are stripped, sorted by length and
+    batched, then tokenized with the model's own tokenizer, padded per batch and
+    truncated to `max_seq_length`; results come back in input order.
+    """
+
+    def __init__(self, export_dir: Path, quantized: bool = False, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.export_dir = Path(export_dir)
+        config = json.loads((self.export_dir / CONFIG_FILE).read_text())
+        self.max_seq_length: Optional[int] = config.get("max_seq_length")
+        self.input_names: List[str] = config["input_names"]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.export_dir))
+        self.model_file = self.export_dir / (INT8_MODEL_FILE if quantized else MODEL_FILE)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(self.model_file), options, providers=["CPUExecutionProvider"])
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = False) -> np.ndarray:
+        texts = [str(t).strip() for t in texts]
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation="longest_first",
+                max_length=self.max_seq_length, return_tensors="np",
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            batches.append(self.session.run(None, feed)[0])
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
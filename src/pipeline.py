@@ -0,0 +1,422 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from .ocr import extract_file
+from .utils import setup_logging
+
+logger = setup_logging("Ingestion_Pipeline")
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+class IngestionPipeline:
+    """
+    Staged ingestion: extract -> summarize -> embed -> index.
+
+    - extract:   content-cache lookup, then a process pool for OCR / PDF
+                 parsing (CPU-bound, holds the GIL); cache hits skip straight
+                 to the index stage
+    - summarize: thread pool for summarization (mostly waiting on Ollama) and
+                 classification, then the metadata JSON is written
+    - embed:     one thread, batching texts from several documents into each
+                 `model.encode` call
+    - index:     one writer thread, appending inside a single `indexer.batch()`
+
+    Stages are connected by bounded queues, so a slow stage applies
+    back-pressure instead of letting extracted text pile up in memory.
+
+    `run` ingests a known list of files; `open` starts the stages for files
+    that arrive one at a time (e.g. crawler downloads), see `PipelineStream`.
+    """
+
+    def __init__(
+        self,
+        processor,
+        extract_workers: int = 0,
+        summarize_workers: int = 4,
+        embed_batch_size: int = 64,
+        queue_size: int = 32,
+    ):
+        """
+        Args:
+            processor: DocumentProcessor providing the summarizer, embedder and indexer.
+            extract_workers: OCR processes (0 = one per CPU core).
+            summarize_workers: Summarization threads.
+            embed_batch_size: Texts gathered per encode call.
+            queue_size: Max documents waiting between two stages.
+        """
+        self.processor = processor
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.summarize_workers = max(1, summarize_workers)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.queue_size = max(1, queue_size)
+
+    @classmethod
+    def from_config(cls, processor, config: Dict) -> "IngestionPipeline":
+        cfg = config.get("ingestion", {}) or {}
+        return cls(
+            processor,
+            extract_workers=int(cfg.get("extract_workers", 0)),
+            summarize_workers=int(cfg.get("summarize_workers", 4)),
+            embed_batch_size=int(cfg.get("embed_batch_size", 64)),
+            queue_size=int(cfg.get("queue_size", 32)),
+        )
+
+    def run(self, files: List[Path]) -> List[str]:
+        """Ingests `files`; returns the names of the files that were indexed."""
+        files = [Path(f) for f in files]
+        if not files:
+            return []
+        logger.info(
+            f"Ingesting {len(files)} files ({min(self.extract_workers, len(files))} OCR processes, "
+            f"{self.summarize_workers} summarizer threads)..."
+        )
+        stream = self._start(files, min(self.extract_workers, len(files)))
+        indexed = stream.close()
+        logger.info(f"Pipeline indexed {len(indexed)}/{len(files)} files.")
+        return indexed
+
+    def open(self, replace: bool = False) -> "PipelineStream":
+        """
+        Starts the stages and returns a stream to `submit` files to as they arrive.
+        With `replace`, a file indexed from the same path before (e.g. a download
+        that changed upstream) has its old vectors removed when the new ones are added.
+        """
+        inbox: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        return self._start(self._arrivals(inbox), self.extract_workers, inbox, replace)
+
+    @staticmethod
+    def _arrivals(inbox: queue.Queue):
+        """Yields submitted files, and None whenever none arrived for a moment."""
+        while True:
+            try:
+                item = inbox.get(timeout=0.2)
+            except queue.Empty:
+                yield None
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _start(self, files: Iterable[Path], extract_workers: int, inbox: queue.Queue = None,
+               replace: bool = False) -> "PipelineStream":
+        extracted: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        enriched: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        indexed: List[str] = []
+
+        extractor = threading.Thread(
+            target=self._extract_stage, args=(files, extract_workers, extracted, embedded), name="ingest-extract"
+        )
+        summarizers = [
+            threading.Thread(target=self._summarize_stage, args=(extracted, enriched), name=f"ingest-summarize-{i}")
+            for i in range(self.summarize_workers)
+        ]
+        embedder = threading.Thread(target=self._embed_stage, args=(enriched, embedded), name="ingest-embed")
+        writer = threading.Thread(target=self._index_stage, args=(embedded, indexed, replace), name="ingest-index")
+
+        for thread in [extractor, *summarizers, embedder, writer]:
+            thread.start()
+        return PipelineStream(inbox, extractor, summarizers, embedder, writer, enriched, indexed)
+
+    def _extract_stage(self, files: Iterable[Path], workers: int, out: queue.Queue, cached_out: queue.Queue):
+        try:
+            indexed_filenames = self.processor.indexer.store.filenames()
+            hashes_seen = set()
+            # spawn, not fork: the parent holds torch / FAISS threads and locks
+            context = multiprocessing.get_context("spawn")
+            # Files are already spread over every core; OCR each one's pages in-process
+            ocr_options = dict(self.processor.ocr.page_settings, page_workers=1)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                pending = {}
+                for path in files:
+                    if path is None:
+                        # Idle stream: forward extractions that finished meanwhile
+                        if pending:
+                            self._drain(pending, out, timeout=0)
+                        continue
+                    path = Path(path)
+                    try:
+                        sha256, status, cached = self.processor.check_cache(path, indexed_filenames, hashes_seen)
+                    except Exception as e:
+                        logger.error(f"Failed to hash {path.name}: {e}")
+                        continue
+                    if status == "hit":
+                        data, embeddings, metadatas = cached
+                        cached_out.put((path, embeddings, metadatas, None))
+                        continue
+                    if status == "duplicate":
+                        continue
+                    hashes_seen.add(sha256)
+                    pending[pool.submit(extract_file, str(path), ocr_options)] = (path, sha256)
+                    # Keep at most queue_size extractions in flight
+                    if len(pending) >= self.queue_size:
+                        self._drain(pending, out)
+                    else:
+                        # Forward whatever already finished, without waiting
+                        self._drain(pending, out, timeout=0)
+                while pending:
+                    self._drain(pending, out)
+        except Exception as e:
+            logger.error(f"Extraction stage failed: {e}")
+        finally:
+            out.put(_DONE)
+
+    @staticmethod
+    def _drain(pending: Dict, out: queue.Queue, timeout: float = None):
+        """Waits (up to `timeout`) for at least one extraction and forwards the finished ones."""
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, sha256 = pending.pop(future)
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.error(f"Failed to extract {path.name}: {e}")
+                continue
+            if not data or not data.get('content'):
+                logger.warning(f"No content extracted from {path.name}")
+                continue
+            out.put((path, sha256, data))
+
+    def _summarize_stage(self, inp: queue.Queue, out: queue.Queue):
+        while True:
+            item = inp.get()
+            if item is _DONE:
+                # Let the sibling summarizer threads see the end of the stream too
+                inp.put(_DONE)
+                return
+            path, sha256, data = item
+            try:
+                self.processor.enrich(data, path)
+                texts, metadatas = self.processor.index_records(
+                    data, data['content'], data['summary'], data['categories'], path.name
+                )
+            except Exception as e:
+                logger.error(f"Failed to process {path.name}: {e}")
+                continue
+            out.put((path, sha256, data, texts, metadatas))
+
+    def _embed_stage(self, inp: queue.Queue, out: queue.Queue):
+        finished = False
+        while not finished:
+            docs = []
+            item = inp.get()
+            if item is _DONE:
+                break
+            docs.append(item)
+            n_texts = len(item[3])
+            # Top the batch up with whatever is already waiting
+            while n_texts < self.embed_batch_size:
+                try:
+                    item = inp.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                docs.append(item)
+                n_texts += len(item[3])
+
+            try:
+                embeddings = self.processor.embedder.generate([t for doc in docs for t in doc[3]])
+            except Exception as e:
+                logger.error(f"Failed to embed {[doc[0].name for doc in docs]}: {e}")
+                continue
+            offset = 0
+            for path, sha256, data, texts, metadatas in docs:
+                vectors = embeddings[offset:offset + len(texts)]
+                out.put((path, vectors, metadatas, (sha256, data, texts)))
+                offset += len(texts)
+        out.put(_DONE)
+
+    def _index_stage(self, inp: queue.Queue, indexed: List[str], replace: bool = False):
+        indexer = self.processor.indexer
+        with indexer.batch():
+            while True:
+                item = inp.get()
+                if item is _DONE:
+                    return
+                path, embeddings, metadatas, to_cache = item
+                try:
+                    if replace:
+                        # Earlier vectors of this file may still be buffered in the batch.
+                        # Matched by path: another file with the same name is untouched.
+                        indexer.flush()
+                        indexer.remove_path(path)
+                    indexer.add_documents(np.ascontiguousarray(embeddings), metadatas)
+                    indexed.append(path.name)
+                except Exception as e:
+                    logger.error(f"Failed to index {path.name}: {e}")
+                    continue
+                if to_cache is not None:
+                    sha256, data, texts = to_cache
+                    self.processor.cache_content(sha256, path.name, data, texts, embeddings)
+                if inp.empty():
+                    # Nothing else ready: make what we have searchable now
+                    indexer.flush()
+
+class PipelineStream:
+    """
+    A running `IngestionPipeline` fed one file at a time. `submit` blocks
+    while the pipeline is saturated, so the producer is slowed down instead of
+    queueing files without bound; `close` waits for everything submitted to be
+    indexed and returns the names of the indexed files.
+    """
+
+    def __init__(self, inbox, extractor, summarizers, embedder, writer, enriched, indexed):
+        self._inbox = inbox
+        self._extractor = extractor
+        self._summarizers = summarizers
+        self._embedder = embedder
+        self._writer = writer
+        self._enriched = enriched
+        self._indexed = indexed
+
+    def submit(self, path: Path):
+        self._inbox.put(Path(path))
+
+    @property
+    def indexed(self) -> List[str]:
+        """Names of the files indexed so far."""
+        return list(self._indexed)
+
+    def close(self) -> List[str]:
+        if self._inbox is not None:
+            self._inbox.put(_DONE)
+        self._extractor.join()
+        for thread in self._summarizers:
+            thread.join()
+        self._enriched.put(_DONE)
+        self._embedder.join()
+        self._writer.join()
+        return self._indexed
+
+class CrawlDownloads:
+    """
+    Indexes the files a crawl downloads while it runs and confirms each one's
+    URL to the crawler only once its file is indexed, so a download that never
+    made it into the index is delivered again by the next crawl:
+
+        downloads = CrawlDownloads(engine, crawler)
+        try:
+            crawler.crawl(..., on_file_saved=downloads.submit)
+        finally:
+            indexed = downloads.close()
+    """
+
+    def __init__(self, engine, crawler):
+        """
+        Args:
+            engine: SearchEngine whose `ingest_stream()` indexes the files.
+            crawler: WebCrawler to `confirm` the downloaded URLs on.
+        """
+        self.engine = engine
+        self.crawler = crawler
+        self._stream = engine.ingest_stream()
+        # path -> URL of every file handed to the stream
+        self._saved: Dict[Path, str] = {}
+
+    def submit(self, path: Path):
+        """`on_file_saved` callback: queues the file for indexing."""
+        from .scraper import file_meta_path
+        self._saved[path] = json.loads(file_meta_path(path).read_text())["source_url"]
+        self._stream.submit(path)
+
+    def close(self) -> List[str]:
+        """Waits for the submitted files to be indexed; returns their names."""
+        indexed = self._stream.close()
+        for path, url in self._saved.items():
+            # Duplicates of content indexed under another name count as indexed
+            if self.engine.is_indexed(path):
+                self.crawler.confirm(url)
+        return indexed
+
+class ChunkBatcher:
+    """
+    Embeds and indexes small (text, metadata) chunks arriving from many short
+    documents, e.g. crawled pages: chunks from several pages share one
+    `model.encode` call of up to `batch_size` texts and one index append.
+    A background thread does the work, so `add` only queues; a chunk waits at
+    most `max_latency` seconds before it is flushed, even if the batch is not
+    full, so live indexing stays live.
+    """
+
+    def __init__(self, embedder, indexer, batch_size: int = 128, max_latency: float = 2.0, on_indexed=None):
+        """
+        Args:
+            embedder: EmbeddingGenerator.
+            indexer: FaissIndexer to append to.
+            batch_size: Texts per encode call / index append.
+            max_latency: Seconds a queued chunk may wait for its batch to fill.
+            on_indexed: Optional callback(metadatas) after each batch is indexed.
+        """
+        self.embedder = embedder
+        self.indexer = indexer
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max(0.0, max_latency)
+        self.on_indexed = on_indexed
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._oldest = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="chunk-batcher", daemon=True)
+        self._thread.start()
+
+    def add(self, texts: List[str], metadatas: List[Dict]):
+        """Queues chunks; blocks while several batches are already waiting."""
+        with self._cond:
+            while len(self._texts) >= 4 * self.batch_size and not self._closed:
+                self._cond.wait()
+            if not self._texts:
+                self._oldest = time.monotonic()
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._cond.notify_all()
+
+    def close(self):
+        """Flushes everything queued and stops the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._texts and (
+                        self._closed
+                        or len(self._texts) >= self.batch_size
+                        or time.monotonic() - self._oldest >= self.max_latency
+                    ):
+                        break
+                    if self._closed:
+                        return
+                    timeout = self.max_latency - (time.monotonic() - self._oldest) if self._texts else None
+                    self._cond.wait(timeout)
+                texts, self._texts = self._texts[:self.batch_size], self._texts[self.batch_size:]
+                metadatas, self._metadatas = self._metadatas[:self.batch_size], self._metadatas[self.batch_size:]
+                # Leftovers keep the old timestamp, so they are flushed no later than due;
+                # wake producers blocked on a full queue
+                self._cond.notify_all()
+            try:
+                embeddings = self.embedder.generate(texts)
+                self.indexer.add_documents(embeddings, metadatas)
+            except Exception as e:
+                logger.error(f"Failed to index {len(texts)} chunks: {e}")
+                continue
+            if self.on_indexed:
+                try:
+                    self.on_indexed(metadatas)
+                except Exception as e:
+                    logger.error(f"on_indexed callback failed: {e}")
@@ -1,14 +1,16 @@
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 import logging
 
 from .ocr import OCREngine
 from .embeddings import EmbeddingGenerator
-from .indexer import FaissIndexer
+from .indexer import get_shared_indexer
 from .summarizer import DocumentSummarizer
 from .classifier import NoticeClassifier
+from .chunker import TextChunker
+from .content_cache import ContentCache, file_sha256, chunks_hash
 from .utils import setup_logging
 
 logger = setup_logging("DocumentProcessor")
@@ -16,9 +18,13 @@ logger = setup_logging("DocumentProcessor")
 class DocumentProcessor:
     def __init__(self, config: Dict):
         self.config = config
-        self.ocr = OCREngine()
-        self.embedder = EmbeddingGenerator(config['search'].get('model_name', 'all-MiniLM-L6-v2'))
-        self.indexer = FaissIndexer(Path(config['directories']['index']))
+        self.ocr = OCREngine.from_config(config)
+        self.embedder = EmbeddingGenerator.from_config(config)
+        self.indexer = get_shared_indexer(Path(config['directories']['index']), config)
+        # Chunks are sized with the embedding model's own tokenizer
+        self.chunker = TextChunker.from_config(
+            config, tokenizer=self.embedder.tokenizer, model_max_tokens=self.embedder.max_seq_length
+        )
         summarization_cfg = config.get('summarization', {})
         self.summarizer = DocumentSummarizer(
             method=summarization_cfg.get('method', 'extract'),
@@ -29,6 +35,10 @@ class DocumentProcessor:
             timeout=summarization_cfg.get('timeout', 90),
         )
         self.classifier = NoticeClassifier()
+        # Identical files (e.g. a notice re-downloaded under another name) are
+        # served from here instead of being OCRed, summarized and embedded again
+        self.content_cache = ContentCache(Path(config['directories']['index']) / "content_cache.db")
+        self.cache_counts = {"hits": 0, "misses": 0, "duplicates": 0}
         
         self.metadata_dir = Path(config['directories']['metadata'])
         self.processed_dir = Path(config['directories']['processed'])
@@ -45,30 +55,28 @@ class DocumentProcessor:
         logger.info(f"Processing file: {file_path.name}")
         
         try:
+            # 0. Content cache
+            sha256, status, cached = self.check_cache(file_path)
+            if status == "duplicate":
+                return None
+            if status == "hit":
+                data, embeddings, metadatas = cached
+                with self.indexer.batch():
+                    self.indexer.add_documents(embeddings, metadatas)
+                return data
+
             # 1. OCR Extraction
             data = self.ocr.process_file(file_path)
             if not data or not data.get('content'):
                 logger.warning(f"No content extracted from {file_path.name}")
                 return None
 
-            text_content = data['content']
-            
-            # 2. Analysis (Summarization & Classification)
-            summary = self.summarizer.summarize(text_content)
-            categories = self.classifier.classify(text_content)
-            
-            # 3. Enhance Metadata
-            data['summary'] = summary
-            data['categories'] = categories
-            data['ingest_date'] = datetime.now().isoformat()
-            data['file_size'] = file_path.stat().st_size
-            data['processed'] = True
-            
-            # 4. Save Metadata to Disk
-            self._save_metadata(data, file_path.name)
-            
+            # 2-4. Summarize, classify, save metadata
+            self.enrich(data, file_path)
+
             # 5. Indexing Strategy (Hybrid)
-            self._index_document(data, text_content, summary, categories, file_path.name)
+            texts, embeddings = self._index_document(data, data['content'], data['summary'], data['categories'], file_path.name)
+            self.cache_content(sha256, file_path.name, data, texts, embeddings)
             
             return data
 
@@ -76,6 +84,95 @@ class DocumentProcessor:
             logger.error(f"Failed to process {file_path.name}: {e}")
             return None
 
+    def check_cache(
+        self,
+        file_path: Path,
+        indexed_filenames: Optional[Set[str]] = None,
+        pending_hashes: Optional[Set[str]] = None,
+    ) -> Tuple[str, str, Optional[Tuple]]:
+        """
+        Looks `file_path` up by content hash. Returns (sha256, status, cached):
+        - "duplicate": the same bytes are already indexed under another filename
+          (or are in `pending_hashes`, files of the current run not yet indexed)
+        - "hit": seen before but not indexed (e.g. after a clear); `cached` is
+          (data, embeddings, metadatas) ready for `indexer.add_documents`
+        - "miss": unknown content, `cached` is None
+        """
+        sha256 = file_sha256(file_path)
+        if pending_hashes and sha256 in pending_hashes:
+            logger.info(f"{file_path.name} is identical to a file already being ingested; skipping.")
+            self.cache_counts['duplicates'] += 1
+            return sha256, "duplicate", None
+        entry = self.content_cache.get(sha256)
+        if entry is not None:
+            if indexed_filenames is None:
+                # The copy may still be buffered in this thread's indexer batch
+                self.indexer.flush()
+                indexed_filenames = self.indexer.store.filenames()
+            if entry['filename'] in indexed_filenames:
+                logger.info(f"{file_path.name} is identical to indexed {entry['filename']}; skipping.")
+                self.cache_counts['duplicates'] += 1
+                return sha256, "duplicate", None
+
+            data = dict(entry['data'])
+            data['filename'] = file_path.name
+            data['path'] = str(file_path)
+            data['ingest_date'] = datetime.now().isoformat()
+            data['file_size'] = file_path.stat().st_size
+            texts, metadatas = self.index_records(data, data['content'], data['summary'], data['categories'], file_path.name)
+            # Reuse the vectors only while chunking still produces the same texts and
+            # they come from the embedder (model, backend, normalization) now in use
+            reusable = (
+                chunks_hash(texts[1:]) == entry['chunks_hash']
+                and entry['embedder'] == self.embedder.signature
+                and entry['embeddings'].shape == (len(texts), self.indexer.dimension)
+            )
+            if reusable:
+                logger.info(f"Content cache hit for {file_path.name} (first seen as {entry['filename']}).")
+                self._save_metadata(data, file_path.name)
+                self.content_cache.set_filename(sha256, file_path.name)
+                self.cache_counts['hits'] += 1
+                return sha256, "hit", (data, entry['embeddings'], metadatas)
+
+        self.cache_counts['misses'] += 1
+        return sha256, "miss", None
+
+    def cache_content(self, sha256: str, filename: str, data: Dict, texts: List[str], embeddings):
+        try:
+            self.content_cache.put(sha256, filename, data, chunks_hash(texts[1:]), embeddings,
+                                   self.embedder.signature)
+        except Exception as e:
+            logger.warning(f"Could not cache {filename}: {e}")
+
+    def reset_cache_counts(self) -> Dict:
+        """Returns the cache counters since the last reset and zeroes them."""
+        counts = dict(self.cache_counts)
+        total = sum(counts.values())
+        counts['hit_rate'] = (counts['hits'] + counts['duplicates']) / total if total else 0.0
+        self.cache_counts = {"hits": 0, "misses": 0, "duplicates": 0}
+        return counts
+
+    def enrich(self, data: Dict, file_path: Path) -> Dict:
+        """
+        Adds summary, categories and ingest fields to extracted `data` and
+        saves its metadata JSON. Shared by `process_file` and the parallel
+        ingestion pipeline.
+        """
+        text_content = data['content']
+
+        # Analysis (Summarization & Classification)
+        data['summary'] = self.summarizer.summarize(text_content)
+        data['categories'] = self.classifier.classify(text_content)
+
+        # Enhance Metadata
+        data['ingest_date'] = datetime.now().isoformat()
+        data['file_size'] = file_path.stat().st_size
+        data['processed'] = True
+
+        # Save Metadata to Disk
+        self._save_metadata(data, file_path.name)
+        return data
+
     def _save_metadata(self, data: Dict, filename: str):
         meta_pth = self.metadata_dir / f"{filename}.json"
         with open(meta_pth, 'w') as f:
@@ -86,60 +183,45 @@ class DocumentProcessor:
         Implements Hybrid Indexing:
         1. Summary Vector: Metadata + Summary + Categories
         2. Content Chunks: Actual text content split into chunks
+
+        Both parts are committed to the index in a single batch.
+        Returns the embedded texts and their vectors.
         """
-        
+        texts, metadatas = self.index_records(metadata, content, summary, categories, filename)
+        # One encode call for the summary and all chunks
+        embeddings = self.embedder.generate(texts)
+        with self.indexer.batch():
+            self.indexer.add_documents(embeddings, metadatas)
+        return texts, embeddings
+
+    def index_records(self, metadata: Dict, content: str, summary: str, categories: List[str], filename: str):
+        """
+        Builds the texts to embed and their metadata records for one document:
+        the summary vector first, then one per content chunk.
+        """
+        base_meta = metadata.copy()
+        base_meta.pop('content', None)
+        page_starts = base_meta.pop('page_starts', None)
+
         # --- A. Index Summary (High-level gist) ---
         # Rich representation for broad queries
         summary_text = f"{summary} {' '.join(categories)} {metadata.get('filename', '')}"
-        summary_embedding = self.embedder.generate(summary_text)
-        
-        summary_meta = metadata.copy()
+        summary_meta = base_meta.copy()
         summary_meta['type'] = 'summary'
         summary_meta['id'] = f"{filename}_summary"
         summary_meta['content_snippet'] = summary # Show summary as snippet
-        if 'content' in summary_meta: 
-            del summary_meta['content']
-            
-        self.indexer.add_single_document(summary_embedding, summary_meta)
-        
+
+        texts, metadatas = [summary_text], [summary_meta]
+
         # --- B. Index Content Chunks (Specific details) ---
-        chunks = self._chunk_text(content)
-        if chunks:
-            chunk_embeddings = self.embedder.generate(chunks)
-            chunk_metadatas = []
-            
-            for i, chunk in enumerate(chunks):
-                c_meta = metadata.copy()
-                c_meta['type'] = 'chunk'
-                c_meta['id'] = f"{filename}_chunk_{i}"
-                c_meta['content_snippet'] = chunk
-                if 'content' in c_meta:
-                    del c_meta['content']
-                chunk_metadatas.append(c_meta)
-                
-            self.indexer.add_documents(chunk_embeddings, chunk_metadatas)
-
-    def _chunk_text(self, text: str, chunk_size: int = 500) -> List[str]:
-        """
-        Simple paragraph-based chunking.
-        """
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        chunks = []
-        current_chunk = ""
-        
-        for p in paragraphs:
-            if len(current_chunk) + len(p) < chunk_size:
-                current_chunk += " " + p
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = p
-                
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        # Fallback if no paragraphs
-        if not chunks and text:
-            chunks = [text]
-            
-        return chunks
+        for i, chunk in enumerate(self.chunker.chunk(content, page_starts)):
+            c_meta = base_meta.copy()
+            c_meta['type'] = 'chunk'
+            c_meta['id'] = f"{filename}_chunk_{i}"
+            c_meta['content_snippet'] = chunk['text']
+            if chunk['page'] is not None:
+                c_meta['page'] = chunk['page']
+            texts.append(chunk['text'])
+            metadatas.append(c_meta)
+
+        return texts, metadatas
@@ -1,8 +1,9 @@
 import logging
 import requests
+import httpx
 import json
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from .utils import setup_logging
 
 logger = setup_logging("QA_Engine")
@@ -18,11 +19,15 @@ class MistralQAEngine:
         model_url: str = "http://localhost:11434/api/generate",
         model_name: str = "mistral",
         timeout: int = 120,
+        max_connections: int = 4,
     ):
         # Prefer IPv4 loopback for Ollama on systems binding only 127.0.0.1
         self.model_url = (model_url or "").replace("http://localhost:", "http://127.0.0.1:")
         self.model_name = model_name
         self.timeout = timeout
+        self.max_connections = max_connections
+        # Pooled async client for the API; created on first use inside the event loop
+        self._async_client: Optional[httpx.AsyncClient] = None
         logger.info(f"Initialized Mistral Q&A Engine with model: {model_name}")
     
     def answer_question(self, question: str, context_docs: List[Dict]) -> Dict[str, str]:
@@ -38,37 +43,60 @@ class MistralQAEngine:
             Dict with 'answer', 'sources', and 'confidence' keys
         """
         if not context_docs:
-            return {
-                "answer": "I couldn't find any relevant documents to answer your question.",
-                "sources": [],
-                "confidence": "low"
-            }
-        
-        # Build context from top documents
-        context_text = self._build_context(context_docs)
-        
-        # Create prompt
-        prompt = self._create_qa_prompt(question, context_text)
-        
+            return self._no_context_answer()
+
+        prompt = self._create_qa_prompt(question, self._build_context(context_docs))
+
         # Query Mistral
         try:
             response = self._query_mistral(prompt)
-            
-            # Extract sources
-            sources = [doc.get('filename', 'Unknown') for doc in context_docs[:3]]
-            
-            return {
-                "answer": response,
-                "sources": sources,
-                "confidence": "high" if len(context_docs) >= 2 else "medium"
-            }
+            return self._format_answer(response, context_docs)
         except Exception as e:
-            logger.error(f"Q&A generation failed: {e}")
-            return {
-                "answer": f"Error generating answer: {str(e)}. Please ensure Ollama is running with Mistral model.",
-                "sources": [],
-                "confidence": "error"
-            }
+            return self._error_answer(e)
+
+    async def answer_question_async(self, question: str, context_docs: List[Dict]) -> Dict[str, str]:
+        """
+        Same as `answer_question`, but awaits Ollama on a pooled async HTTP
+        client so the API's event loop stays free during generation.
+        """
+        if not context_docs:
+            return self._no_context_answer()
+
+        prompt = self._create_qa_prompt(question, self._build_context(context_docs))
+
+        try:
+            response = await self._query_mistral_async(prompt)
+            return self._format_answer(response, context_docs)
+        except Exception as e:
+            return self._error_answer(e)
+
+    @staticmethod
+    def _no_context_answer() -> Dict:
+        return {
+            "answer": "I couldn't find any relevant documents to answer your question.",
+            "sources": [],
+            "confidence": "low"
+        }
+
+    @staticmethod
+    def _format_answer(response: str, context_docs: List[Dict]) -> Dict:
+        # Extract sources
+        sources = [doc.get('filename', 'Unknown') for doc in context_docs[:3]]
+
+        return {
+            "answer": response,
+            "sources": sources,
+            "confidence": "high" if len(context_docs) >= 2 else "medium"
+        }
+
+    @staticmethod
+    def _error_answer(error: Exception) -> Dict:
+        logger.error(f"Q&A generation failed: {error}")
+        return {
+            "answer": f"Error generating answer: {str(error)}. Please ensure Ollama is running with Mistral model.",
+            "sources": [],
+            "confidence": "error"
+        }
     
     def _build_context(self, docs: List[Dict], max_chars=3000) -> str:
         """Build context string from documents."""
@@ -111,9 +139,8 @@ Instructions:
 Answer:"""
         return prompt
     
-    def _query_mistral(self, prompt: str) -> str:
-        """Query Mistral via Ollama API."""
-        payload = {
+    def _payload(self, prompt: str) -> Dict:
+        return {
             "model": self.model_name,
             "prompt": prompt,
             "stream": False,
@@ -123,6 +150,9 @@ Answer:"""
             }
         }
 
+    def _query_mistral(self, prompt: str) -> str:
+        """Query Mistral via Ollama API."""
+        payload = self._payload(prompt)
         timeout = self.timeout or 120
         try:
             response = requests.post(self.model_url, json=payload, timeout=timeout)
@@ -141,6 +171,35 @@ Answer:"""
                 return (result.get("response", "") or "").strip()
             raise e
 
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout or 120, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._async_client
+
+    async def _query_mistral_async(self, prompt: str) -> str:
+        """Query Mistral via Ollama API without blocking the event loop."""
+        response = await self._get_async_client().post(self.model_url, json=self._payload(prompt))
+        response.raise_for_status()
+        return (response.json().get("response", "") or "").strip()
+
+    async def list_models_async(self, timeout: float = 2.0) -> List[str]:
+        """Names of the models Ollama has pulled (from /api/tags)."""
+        base = self.model_url.split("/api/")[0]
+        response = await self._get_async_client().get(f"{base}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
 
 class MistralSummarizer:
     """Standalone Mistral summarizer for document processing."""
@@ -4,7 +4,7 @@ Takes any URL, extracts text content, and indexes it into FAISS.
 Also supports downloading PDFs/images for OCR processing.
 """
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import logging
 import json
 import re
@@ -13,7 +13,12 @@ import hashlib
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 import time
-from collections import deque
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from .content_cache import file_sha256
+from .crawl_state import CrawlFrontier, CrawlState
 from .utils import setup_logging
 
 logger = setup_logging("Scraper")
@@ -28,11 +33,188 @@ USER_AGENTS = [
 DOWNLOAD_EXTS = {'.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx'}
 SKIP_EXTS = {'.js', '.css', '.ico', '.svg', '.woff', '.woff2', '.ttf', '.eot', '.map'}
 
+# Subtrees dropped before extracting text (navigation, boilerplate, code)
+JUNK_TAGS = frozenset({'nav', 'footer', 'script', 'style', 'header', 'aside'})
+HEADING_TAGS = frozenset({'h1', 'h2', 'h3', 'h4'})
+TITLE_TAGS = ('title', 'h1', 'h2')
+
+DATE_PATTERN = re.compile(
+    r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|'
+    r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{1,2},?\s+\d{4})\b',
+    re.IGNORECASE
+)
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]{4,}\b')
+WHITESPACE = re.compile(r'\s+')
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+STOP_WORDS = frozenset({'the','a','an','and','or','of','to','in','is','it','be','are','was','for',
+                        'this','that','with','from','have','has','at','by','on','as','but','not'})
+
+def file_meta_path(path: Path) -> Path:
+    """Sidecar JSON (source_url, source_page, ...) written next to each downloaded file."""
+    path = Path(path)
+    return path.with_suffix(path.suffix + '.meta.json')
+
 def _url_ext(url: str) -> str:
     path = urlparse(url).path.lower()
     return Path(path).suffix if '.' in path else ''
 
 
+def parse_html(content, content_type: str = ''):
+    """Parses an HTML body (bytes or str) with lxml; returns the root element or None."""
+    if isinstance(content, bytes):
+        # libxml2 falls back to Latin-1 for undeclared bytes; decode what we can first
+        declared = CHARSET_PATTERN.search(content_type)
+        for encoding in ([declared.group(1)] if declared else []) + ['utf-8']:
+            try:
+                content = content.decode(encoding)
+                break
+            except (LookupError, UnicodeDecodeError):
+                continue
+    try:
+        try:
+            return lxml_html.document_fromstring(content)
+        except ValueError:
+            # str input with an XML encoding declaration
+            return lxml_html.document_fromstring(content.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+def extract_page_data(url: str, content, content_type: str = '') -> dict:
+    """
+    Extract structured key-value data from a page.
+    Returns a dict with: title, description, headings, paragraphs, links,
+                         dates, keywords, full_text
+
+    One walk over the lxml tree collects everything: text nodes go into a
+    single list, and each heading / paragraph / link / title takes the
+    slice of that list between its start and end tags.
+    """
+    root = parse_html(content, content_type) if content else None
+    if root is None:
+        return {}
+
+    strings = []
+    titles = {}
+    meta_desc = None
+    headings, paragraphs, links_out = [], [], []
+    # (tag, element, offset in strings, slot in its output list)
+    open_captures = []
+
+    walker = etree.iterwalk(root, events=('start', 'end', 'comment', 'pi'))
+    for event, el in walker:
+        if event == 'start':
+            tag = el.tag
+            if tag in JUNK_TAGS:
+                walker.skip_subtree()
+                continue
+            if tag in HEADING_TAGS:
+                headings.append(None)
+                open_captures.append((tag, el, len(strings), len(headings) - 1))
+            elif tag == 'p':
+                paragraphs.append(None)
+                open_captures.append((tag, el, len(strings), len(paragraphs) - 1))
+            elif tag == 'a' and el.get('href') is not None:
+                links_out.append(None)
+                open_captures.append((tag, el, len(strings), len(links_out) - 1))
+            elif tag == 'title':
+                open_captures.append((tag, el, len(strings), None))
+            elif tag == 'meta' and meta_desc is None and el.get('name') == 'description':
+                meta_desc = el.get('content', '')
+            text = el.text and el.text.strip()
+            if text:
+                strings.append(text)
+            continue
+
+        if event == 'end' and open_captures and open_captures[-1][1] is el:
+            tag, _, start, slot = open_captures.pop()
+            text = ''.join(strings[start:])
+            if tag in TITLE_TAGS:
+                titles.setdefault(tag, text)
+            if tag in HEADING_TAGS:
+                headings[slot] = {'level': tag, 'text': text} if len(text) > 3 else None
+            elif tag == 'p':
+                paragraphs[slot] = text if len(text) > 30 else None
+            elif tag == 'a':
+                links_out[slot] = {'url': urljoin(url, el.get('href')), 'text': text[:100]}
+        # Text after a closing tag (or a comment) belongs to the parent
+        tail = el.tail and el.tail.strip()
+        if tail and el is not root:
+            strings.append(tail)
+
+    title_text = next((titles[t] for t in TITLE_TAGS if t in titles), None)
+    if title_text is None:
+        title_text = urlparse(url).path
+
+    # All text combined and cleaned
+    full_text = WHITESPACE.sub(' ', ' '.join(strings)).strip()
+
+    # Date patterns in text (first occurrences, in order)
+    dates = list(dict.fromkeys(DATE_PATTERN.findall(full_text)))[:10]
+
+    # Keyword extraction (simple frequency)
+    freq = Counter(w for w in WORD_PATTERN.findall(full_text.lower()) if w not in STOP_WORDS)
+    keywords = [w for w, _ in freq.most_common(20)]
+
+    return {
+        'source_url': url,
+        'title': title_text[:200],
+        'description': (meta_desc or '')[:500],
+        'headings': [h for h in headings if h][:20],
+        'paragraphs': [p for p in paragraphs if p][:30],
+        'dates_found': dates,
+        'keywords': keywords,
+        'full_text': full_text[:8000],
+        'links': links_out[:50],
+        'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'domain': urlparse(url).netloc,
+    }
+
+
+class HostThrottle:
+    """
+    Per-host politeness: requests to the same host start at least `interval`
+    seconds apart, while requests to different hosts are not delayed at all.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = max(0.0, interval)
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        """Reserves the next request slot for `host` and sleeps until it starts."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class ByteBudget:
+    """
+    Caps the bytes of downloads in progress. A download reserves its size up
+    front and waits while that would exceed the limit; a single file larger
+    than the limit is let through alone.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int):
+        with self._cond:
+            while self.used and self.used + n > self.limit:
+                self._cond.wait()
+            self.used += n
+
+    def release(self, n: int):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
 class WebCrawler:
     """
     Flexible web crawler that:
@@ -41,6 +223,18 @@ class WebCrawler:
     3. Downloads binary files (PDF/images) for OCR
     4. Saves key-value page records for indexing
     5. Optionally restricts to same domain
+
+    Pages are fetched by a pool of worker threads (`max_workers` requests in
+    flight overall, at most `per_host_concurrency` per host, each host paced
+    by `rate_limit`). Workers parse and write the page record themselves, so
+    parsing overlaps with the other workers' network I/O.
+
+    Recrawls are conditional: ETag / Last-Modified and a content hash per URL
+    are kept in a `CrawlState` store (data_dir/crawl_state.db). A page that
+    answers 304 or whose body hash is unchanged is not parsed, recorded or
+    passed to `on_page_saved`; its stored links are followed instead. For
+    content handed to `on_page_saved` / `on_file_saved` that state is only
+    recorded once the caller `confirm`s it was indexed.
     """
 
     def __init__(
@@ -51,10 +245,14 @@ class WebCrawler:
         timeout: int = 12,
         retry_count: int = 2,
         same_domain_only: bool = True,
+        max_workers: int = 8,
+        per_host_concurrency: int = 2,
+        max_download_bytes: int = 64 * 1024 * 1024,
     ):
         self.download_dir = Path(download_dir)
         self.data_dir = Path(data_dir)
         self.pages_dir = self.data_dir / "crawled_pages"
+        # Flat list of downloaded URLs kept by earlier versions; imported once
         self.history_file = self.download_dir / "download_history.txt"
 
         self.download_dir.mkdir(parents=True, exist_ok=True)
@@ -64,13 +262,33 @@ class WebCrawler:
         self.timeout = timeout
         self.retry_count = retry_count
         self.same_domain_only = same_domain_only
-
-        self.downloaded_urls = self._load_history()
-        self.session = requests.Session()
-        self._rotate_ua()
+        self.max_workers = max(1, max_workers)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+
+        self.throttle = HostThrottle(rate_limit)
+        # Bytes of binary downloads in flight, across all workers
+        self.download_budget = ByteBudget(max_download_bytes)
+        self._download_lock = threading.Lock()
+        self.state = CrawlState(self.data_dir / "crawl_state.db")
+        self.frontier = CrawlFrontier(self.data_dir / "crawl_state.db")
+        # url -> CrawlState.record arguments of content delivered but not yet confirmed
+        self._unconfirmed: Dict[str, dict] = {}
+        self._unconfirmed_lock = threading.Lock()
+        if self.history_file.exists() and self.state.count() == 0:
+            self._import_history()
+        # requests.Session is not thread-safe: one per worker thread
+        self._local = threading.local()
 
     # ── helpers ──────────────────────────────────────────────────────────────
 
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            self._rotate_ua()
+        return session
+
     def _rotate_ua(self):
         self.session.headers.update({
             'User-Agent': random.choice(USER_AGENTS),
@@ -78,152 +296,143 @@ class WebCrawler:
             'Accept-Language': 'en-US,en;q=0.5',
         })
 
-    def _load_history(self) -> set:
-        if self.history_file.exists():
-            return set(self.history_file.read_text().splitlines())
-        return set()
-
-    def _save_to_history(self, url: str):
-        with open(self.history_file, 'a') as f:
-            f.write(url + '\n')
-        self.downloaded_urls.add(url)
+    def _import_history(self):
+        """Seeds the state store from download_history.txt (URLs only, no validators)."""
+        urls = [u for u in self.history_file.read_text().splitlines() if u]
+        for url in urls:
+            if _url_ext(url) in DOWNLOAD_EXTS:
+                # Hash the copy already on disk so the next download of it is recognized as unchanged
+                path = self.download_dir / self._file_name(url)
+                digest = file_sha256(path) if path.exists() else None
+                self.state.record(url, 'file', None, None, digest, path=path if digest else None)
+            else:
+                self.state.record(url, 'page', None, None, None)
+        logger.info(f"Imported {len(urls)} URLs from {self.history_file.name}")
 
     def _url_slug(self, url: str) -> str:
         """Short safe filename from URL."""
         return hashlib.md5(url.encode()).hexdigest()[:12]
 
+    def _file_name(self, url: str) -> str:
+        filename = Path(urlparse(url).path).name or f"file_{self._url_slug(url)}.pdf"
+        # sanitize
+        return re.sub(r'[^\w.\-]', '_', filename)[:120]
+
+    @staticmethod
+    def _conditional_headers(state: Optional[dict]) -> dict:
+        headers = {}
+        if state and state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state and state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
     # ── fetch ─────────────────────────────────────────────────────────────────
 
-    def _fetch(self, url: str):
-        """Fetch URL, return (response, soup) or (None, None)."""
+    def _fetch(self, url: str, headers: Optional[dict] = None, stream: bool = False):
+        """Fetch URL, return the response (possibly 304 Not Modified) or None."""
+        host = urlparse(url).netloc
         for attempt in range(self.retry_count):
+            self.throttle.wait(host)
             try:
-                resp = self.session.get(url, timeout=self.timeout, verify=False, allow_redirects=True)
+                resp = self.session.get(
+                    url, headers=headers, stream=stream,
+                    timeout=self.timeout, verify=False, allow_redirects=True,
+                )
                 resp.raise_for_status()
-                ct = resp.headers.get('Content-Type', '')
-                if 'text/html' in ct:
-                    soup = BeautifulSoup(resp.content, 'lxml')
-                    return resp, soup
-                return resp, None
+                return resp
             except Exception as e:
                 logger.warning(f"Fetch attempt {attempt+1} failed for {url}: {e}")
                 time.sleep(1 + attempt)
-        return None, None
+        return None
 
     # ── text extraction ───────────────────────────────────────────────────────
 
-    def _extract_page_data(self, url: str, soup: BeautifulSoup) -> dict:
+    def _hold_state(self, url: str, kind: str, etag: Optional[str], last_modified: Optional[str],
+                    content_hash: str, links: Optional[list] = None, path: Optional[Path] = None):
+        with self._unconfirmed_lock:
+            self._unconfirmed[url] = dict(kind=kind, etag=etag, last_modified=last_modified,
+                                          content_hash=content_hash, links=links, path=path)
+
+    def confirm(self, url: str):
         """
-        Extract structured key-value data from a page.
-        Returns a dict with: title, description, headings, paragraphs, links,
-                             dates, keywords, full_text
+        Records what was fetched from `url` (validators, content hash, links) once
+        the page or file handed to `on_page_saved` / `on_file_saved` is indexed.
+        Until then the URL still counts as changed, so content that never got
+        indexed (indexing off or failed, the process stopped) is delivered again
+        by the next crawl. Safe to call from any thread.
         """
-        if soup is None:
-            return {}
-
-        # Remove nav/footer/script/style junk
-        for tag in soup(['nav', 'footer', 'script', 'style', 'header', 'aside']):
-            tag.decompose()
-
-        title = (soup.find('title') or soup.find('h1') or soup.find('h2'))
-        title_text = title.get_text(strip=True) if title else urlparse(url).path
-
-        # Meta description
-        meta_desc = ''
-        meta = soup.find('meta', attrs={'name': 'description'})
-        if meta:
-            meta_desc = meta.get('content', '')
-
-        # Headings hierarchy
-        headings = []
-        for tag in soup.find_all(['h1', 'h2', 'h3', 'h4']):
-            txt = tag.get_text(strip=True)
-            if txt and len(txt) > 3:
-                headings.append({'level': tag.name, 'text': txt})
-
-        # Main paragraph text
-        paragraphs = []
-        for p in soup.find_all('p'):
-            txt = p.get_text(strip=True)
-            if txt and len(txt) > 30:
-                paragraphs.append(txt)
-
-        # All text combined and cleaned
-        full_text = ' '.join(soup.stripped_strings)
-        full_text = re.sub(r'\s+', ' ', full_text).strip()
-
-        # Date patterns in text
-        date_pattern = re.compile(
-            r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|'
-            r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{1,2},?\s+\d{4})\b',
-            re.IGNORECASE
-        )
-        dates = list(set(date_pattern.findall(full_text)))[:10]
-
-        # Keyword extraction (simple frequency)
-        stop_words = {'the','a','an','and','or','of','to','in','is','it','be','are','was','for',
-                     'this','that','with','from','have','has','at','by','on','as','but','not'}
-        words = re.findall(r'\b[a-zA-Z]{4,}\b', full_text.lower())
-        freq = {}
-        for w in words:
-            if w not in stop_words:
-                freq[w] = freq.get(w, 0) + 1
-        keywords = sorted(freq, key=lambda x: -freq[x])[:20]
-
-        # Outbound links
-        links_out = []
-        for a in soup.find_all('a', href=True):
-            href = urljoin(url, a['href'])
-            text = a.get_text(strip=True)
-            links_out.append({'url': href, 'text': text[:100]})
-
-        return {
-            'source_url': url,
-            'title': title_text[:200],
-            'description': meta_desc[:500],
-            'headings': headings[:20],
-            'paragraphs': paragraphs[:30],
-            'dates_found': dates,
-            'keywords': keywords,
-            'full_text': full_text[:8000],
-            'links': links_out[:50],
-            'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-            'domain': urlparse(url).netloc,
-        }
+        with self._unconfirmed_lock:
+            held = self._unconfirmed.pop(url, None)
+        if held is not None:
+            self.state.record(url, **held)
 
     # ── download binary files ─────────────────────────────────────────────────
 
-    def _download_file(self, url: str, title: str, source_page: str) -> bool:
-        if url in self.downloaded_urls:
-            return False
+    def _download_file(self, url: str, title: str, source_page: str) -> Optional[Path]:
+        """Downloads `url` unless it is unchanged since the last crawl; returns the written path."""
+        state = self.state.get(url)
+        part_path = self.download_dir / f".{self._url_slug(url)}.part"
+        reserved = 0
         try:
-            resp = self.session.get(url, stream=True, timeout=self.timeout, verify=False)
-            resp.raise_for_status()
-
-            filename = Path(urlparse(url).path).name or f"file_{self._url_slug(url)}.pdf"
-            # sanitize
-            filename = re.sub(r'[^\w.\-]', '_', filename)[:120]
-            save_path = self.download_dir / filename
-            if save_path.exists():
-                save_path = self.download_dir / f"{save_path.stem}_{self._url_slug(url)}{save_path.suffix}"
-
-            with open(save_path, 'wb') as f:
+            resp = self._fetch(url, headers=self._conditional_headers(state), stream=True)
+            if resp is None:
+                return None
+            if resp.status_code == 304:
+                self.state.touch(url)
+                return None
+
+            # Unknown length: assume the worst and take the whole budget
+            length = resp.headers.get('Content-Length')
+            reserved = min(int(length), self.download_budget.limit) if length and length.isdigit() \
+                else self.download_budget.limit
+            self.download_budget.acquire(reserved)
+
+            digest = hashlib.sha256()
+            with open(part_path, 'wb') as f:
                 for chunk in resp.iter_content(8192):
+                    digest.update(chunk)
                     f.write(chunk)
+            digest = digest.hexdigest()
+
+            old_path = Path(state['path']) if state and state.get('path') else None
+            if state and state.get('content_hash') == digest and old_path and old_path.exists():
+                part_path.unlink()
+                self.state.record(url, 'file', resp.headers.get('ETag'),
+                                  resp.headers.get('Last-Modified'), digest, path=old_path)
+                return None
+
+            with self._download_lock:
+                if old_path is not None:
+                    # Changed upstream: replace the earlier copy in place
+                    save_path = old_path
+                else:
+                    save_path = self.download_dir / self._file_name(url)
+                    if save_path.exists():
+                        save_path = self.download_dir / f"{save_path.stem}_{self._url_slug(url)}{save_path.suffix}"
+                part_path.replace(save_path)
 
             meta = {
                 'source_url': url, 'source_page': source_page,
                 'link_text': title, 'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
             }
-            save_path.with_suffix(save_path.suffix + '.meta.json').write_text(
+            file_meta_path(save_path).write_text(
                 json.dumps(meta, indent=2)
             )
-            self._save_to_history(url)
+            # Only the path for now, so the next crawl replaces this copy in place;
+            # validators and hash are recorded by `confirm`
+            self.state.record(url, 'file', None, None, None, path=save_path)
+            self._hold_state(url, 'file', resp.headers.get('ETag'),
+                             resp.headers.get('Last-Modified'), digest, path=save_path)
             logger.info(f"Downloaded binary: {save_path.name}")
-            return True
+            return save_path
         except Exception as e:
             logger.warning(f"Binary download failed for {url}: {e}")
-            return False
+            part_path.unlink(missing_ok=True)
+            return None
+        finally:
+            if reserved:
+                self.download_budget.release(reserved)
 
     # ── save page record ──────────────────────────────────────────────────────
 
@@ -235,91 +444,223 @@ class WebCrawler:
 
     # ── main crawl ────────────────────────────────────────────────────────────
 
+    def _crawl_page(self, url: str, depth: int):
+        """
+        Worker: fetch, parse and record one page.
+
+        Returns (page_data, record_path, links), with page_data None when the
+        page is unchanged since the last crawl, or None if it could not be fetched.
+        The new state of a changed page is held until `confirm`.
+        """
+        logger.info(f"[depth={depth}] Crawling: {url}")
+        state = self.state.get(url)
+        resp = self._fetch(url, headers=self._conditional_headers(state))
+        if resp is None:
+            return None
+        if resp.status_code == 304:
+            self.state.touch(url)
+            return None, None, state['links'] if state else []
+        if 'text/html' not in resp.headers.get('Content-Type', ''):
+            return None
+
+        self._rotate_ua()
+        etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        digest = hashlib.sha256(resp.content).hexdigest()
+        if state and state.get('content_hash') == digest:
+            self.state.record(url, 'page', etag, last_modified, digest, links=state['links'])
+            return None, None, state['links']
+
+        page_data = extract_page_data(url, resp.content, resp.headers.get('Content-Type', ''))
+        links = [link['url'] for link in page_data.get('links', [])]
+        record_path = None
+        if page_data.get('full_text'):
+            record_path = self._save_page_record(page_data)
+        self._hold_state(url, 'page', etag, last_modified, digest, links=links)
+        return page_data, record_path, links
+
     def crawl(
         self,
-        start_urls: list,
+        start_urls: Optional[list] = None,
         max_pages: int = 30,
         max_depth: int = 2,
         download_files: bool = True,
         on_page_saved=None,          # callback(page_data) for live indexing
+        on_file_saved=None,          # callback(path) for each new or changed binary file
+        resume: bool = False,
+        stop_event: Optional[threading.Event] = None,
     ) -> dict:
         """
         Crawl from start_urls up to max_pages pages (and optional file downloads).
+        Pages found unchanged since the last crawl count towards max_pages.
+
+        The frontier is persisted (`CrawlFrontier`), so a crawl stopped via
+        `stop_event`, cut short by max_pages or interrupted by a restart can
+        be continued with `resume=True`: the stored seeds, depth and domain
+        settings are reused and start_urls / max_depth are ignored. If there
+        is nothing to resume, a new crawl of start_urls begins.
+
+        Fetching, parsing and record writes run on the worker pool;
+        `on_page_saved` and `on_file_saved` are always called from this (the
+        calling) thread, one at a time, in the order downloads finish. A slow
+        callback holds back new requests, not the ones already in flight.
+        A caller that passes them must `confirm(url)` each page or file once it
+        is indexed; without a callback the crawler confirms by itself.
 
         Returns:
             {
-              'pages_scraped': int,
+              'pages_scraped': int,     # new or changed pages
+              'pages_unchanged': int,   # 304 / same content hash
               'files_downloaded': int,
               'page_records': [path, ...],
+              'pending': int,           # URLs left in the frontier for a resume
+              'stopped': bool,
             }
         """
-        allowed_domains = {urlparse(u).netloc for u in start_urls} if self.same_domain_only else None
+        job = self.frontier.job() if resume else None
+        if job and self.frontier.resume():
+            logger.info(f"Resuming crawl of {job['start_urls']} ({self.frontier.pending()} URLs pending)")
+        else:
+            if not start_urls:
+                raise ValueError("start_urls is required when there is no crawl to resume")
+            job = {
+                'start_urls': list(start_urls),
+                'max_depth': max_depth,
+                'download_files': download_files,
+                'allowed_domains': sorted({urlparse(u).netloc for u in start_urls}) if self.same_domain_only else None,
+            }
+            self.frontier.start(job)
+            self.frontier.add((u, 0, 0) for u in start_urls)
+
+        max_depth = job['max_depth']
+        download_files = job['download_files']
+        allowed_domains = set(job['allowed_domains'] or ())
 
-        visited: set = set()
-        queue: deque = deque([(u, 0) for u in start_urls])
         pages_scraped = 0
+        pages_unchanged = 0
         files_downloaded = 0
         page_records = []
 
-        while queue and pages_scraped < max_pages:
-            url, depth = queue.popleft()
-            if url in visited:
-                continue
-            visited.add(url)
-
+        def wanted(url: str) -> bool:
             ext = _url_ext(url)
             if ext in SKIP_EXTS:
-                continue
-
-            # Binary file to download
+                return False
             if ext in DOWNLOAD_EXTS:
-                if download_files:
-                    if self._download_file(url, '', url):
-                        files_downloaded += 1
-                        time.sleep(self.rate_limit)
-                continue
-
-            # Domain restriction
-            if allowed_domains and urlparse(url).netloc not in allowed_domains:
-                continue
-
-            logger.info(f"[depth={depth}] Crawling: {url}")
-            resp, soup = self._fetch(url)
-            if soup is None:
-                continue
-
-            self._rotate_ua()
-
-            # Extract and save page data
-            page_data = self._extract_page_data(url, soup)
-            if page_data.get('full_text'):
-                record_path = self._save_page_record(page_data)
-                page_records.append(str(record_path))
-                pages_scraped += 1
-                self._save_to_history(url)
-
-                if on_page_saved:
+                return download_files
+            # Domain restriction (binary files are fetched wherever they are linked from)
+            return not allowed_domains or urlparse(url).netloc in allowed_domains
+
+        # future -> (url, depth, is_file)
+        in_flight = {}
+        busy_hosts: dict = {}
+        pages_in_flight = 0
+
+        def finish(future):
+            nonlocal pages_scraped, pages_unchanged, files_downloaded, pages_in_flight
+            url, depth, is_file = in_flight.pop(future)
+            busy_hosts[urlparse(url).netloc] -= 1
+            if not is_file:
+                pages_in_flight -= 1
+            if future.cancelled():
+                self.frontier.release(url)
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"Crawl of {url} failed: {e}")
+                self.frontier.mark_failed(url)
+                return
+
+            if is_file:
+                if result:
+                    files_downloaded += 1
+                    if on_file_saved:
+                        try:
+                            on_file_saved(result)
+                        except Exception as e:
+                            logger.error(f"on_file_saved callback failed: {e}")
+                    else:
+                        self.confirm(url)
+                self.frontier.mark_done(url)
+                return
+            if result is None:
+                self.frontier.mark_failed(url)
+                return
+
+            page_data, record_path, links = result
+            if page_data is None:
+                pages_unchanged += 1
+            else:
+                if record_path is not None:
+                    page_records.append(str(record_path))
+                    pages_scraped += 1
+                if record_path is not None and on_page_saved:
                     try:
                         on_page_saved(page_data)
                     except Exception as e:
                         logger.error(f"on_page_saved callback failed: {e}")
+                else:
+                    # Nothing to index here: the new state stands as is
+                    self.confirm(url)
 
-            # Enqueue children
+            # Enqueue children (depth doubles as priority: breadth-first)
             if depth < max_depth:
-                for link_info in page_data.get('links', []):
-                    child_url = link_info['url']
-                    if child_url not in visited:
-                        child_ext = _url_ext(child_url)
-                        if child_ext not in SKIP_EXTS:
-                            queue.append((child_url, depth + 1))
-
-            time.sleep(self.rate_limit)
-
-        logger.info(f"Crawl done. pages={pages_scraped}, files={files_downloaded}")
+                self.frontier.add((link, depth + 1, depth + 1) for link in links if wanted(link))
+            self.frontier.mark_done(url)
+
+        stopped = False
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as pool:
+            while pages_scraped + pages_unchanged < max_pages:
+                if stop_event is not None and stop_event.is_set():
+                    stopped = True
+                    break
+                # Fill the free worker slots; pages stop being scheduled once
+                # the ones in flight could already reach max_pages
+                while len(in_flight) < self.max_workers:
+                    full_hosts = [h for h, n in busy_hosts.items() if n >= self.per_host_concurrency]
+                    item = self.frontier.pop(full_hosts)
+                    if item is None:
+                        break
+                    url, depth = item
+                    is_file = _url_ext(url) in DOWNLOAD_EXTS
+                    if not is_file and pages_scraped + pages_unchanged + pages_in_flight >= max_pages:
+                        self.frontier.release(url)
+                        break
+                    if is_file:
+                        future = pool.submit(self._download_file, url, '', url)
+                    else:
+                        future = pool.submit(self._crawl_page, url, depth)
+                        pages_in_flight += 1
+                    host = urlparse(url).netloc
+                    busy_hosts[host] = busy_hosts.get(host, 0) + 1
+                    in_flight[future] = (url, depth, is_file)
+
+                if not in_flight:
+                    break
+
+                # Wake up periodically to notice a stop request
+                done, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+
+            # Requests not started yet go back to the frontier; running ones are finished
+            for future in list(in_flight):
+                future.cancel()
+            for future in list(in_flight):
+                wait([future])
+                finish(future)
+
+        pending = self.frontier.pending()
+        logger.info(
+            f"Crawl {'stopped' if stopped else 'done'}. pages={pages_scraped}, "
+            f"unchanged={pages_unchanged}, files={files_downloaded}, pending={pending}"
+        )
         return {
             'pages_scraped': pages_scraped,
+            'pages_unchanged': pages_unchanged,
             'files_downloaded': files_downloaded,
             'page_records': page_records,
+            'pending': pending,
+            'stopped': stopped,
         }
 
 
@@ -347,16 +688,20 @@ class NoticesCrawler(WebCrawler):
             rate_limit=rate,
             timeout=timeout,
             retry_count=retry,
+            max_workers=self.config['scraping'].get('max_workers', 8),
+            per_host_concurrency=self.config['scraping'].get('per_host_concurrency', 2),
+            max_download_bytes=int(self.config['scraping'].get('max_download_mb', 64) * 1024 * 1024),
         )
         self._config_start_urls = self.config['scraping'].get('target_urls', [])
         self._download_limit = self.config['scraping'].get('download_limit', 20)
 
-    def crawl_config(self, limit=None, on_page_saved=None):
+    def crawl_config(self, limit=None, on_page_saved=None, on_file_saved=None):
         """Crawl using config URLs."""
         result = self.crawl(
             start_urls=self._config_start_urls,
             max_pages=limit or self._download_limit,
             on_page_saved=on_page_saved,
+            on_file_saved=on_file_saved,
         )
         return result['pages_scraped'] + result['files_downloaded']
 
@@ -1,10 +1,42 @@
 import logging
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Union
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: ProcessLock only serializes threads
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _log_dir() -> Path:
+    """Resolves `directories.logs` from config/config.yaml against the project root."""
+    logs = "logs"
+    try:
+        import yaml
+        with open(BASE_DIR / "config" / "config.yaml", "r") as f:
+            logs = (yaml.safe_load(f) or {}).get("directories", {}).get("logs", logs)
+    except (ImportError, OSError, AttributeError):
+        pass
+    path = Path(logs)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+LOG_DIR = _log_dir()
+
 
 def setup_logging(name: str = "DigitalArchaeology", log_file: str = "app.log") -> logging.Logger:
-    """Configures and returns a logger instance."""
+    """
+    Configures and returns a logger instance. Relative `log_file` paths land in
+    the configured logs directory, not the current working directory.
+    """
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
@@ -17,7 +49,11 @@ def setup_logging(name: str = "DigitalArchaeology", log_file: str = "app.log") -
         logger.addHandler(c_handler)
         
         # File Handler
-        f_handler = logging.FileHandler(log_file)
+        log_path = Path(log_file)
+        if not log_path.is_absolute():
+            log_path = LOG_DIR / log_path
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        f_handler = logging.FileHandler(log_path)
         f_handler.setLevel(logging.INFO)
         f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         f_handler.setFormatter(f_format)
@@ -27,6 +63,154 @@ def setup_logging(name: str = "DigitalArchaeology", log_file: str = "app.log") -
 
 logger = setup_logging()
 
+class ReadWriteLock:
+    """
+    Many concurrent readers or one writer. Waiting writers block new readers so
+    a steady stream of searches cannot starve ingestion. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+class ProcessLock:
+    """
+    Exclusive lock shared by every process that uses the same lock file
+    (`flock`), and by the threads of this process. Reentrant for the thread
+    holding it. Use as a context manager.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+        except BaseException:
+            self._lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count, with an optional per-entry
+    time-to-live. Tracks hits and misses for reporting.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident memory of the current process (Linux /proc; peak RSS elsewhere on Unix), or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
 def maintain_directories(base_path: Path):
     """Ensures necessary data directories exist."""
     dirs = [
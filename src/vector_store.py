@@ -0,0 +1,90 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .utils import setup_logging
+
+logger = setup_logging("Vector_Store")
+
+class VectorStore:
+    """
+    Full-precision copy of the indexed vectors: one float32 row per FAISS id in
+    a flat file, read through a memory map. Compressed indexes (SQ8 / PQ) only
+    return approximate distances; their top candidates are re-scored against
+    these rows. Rows are paged in by the OS on demand, so the store costs disk
+    and page cache rather than resident memory.
+
+    Ids are never renumbered, so row `id` always belongs to vector `id`; rows of
+    removed vectors are simply never read again.
+    """
+
+    def __init__(self, path: Path, dimension: int):
+        self.path = Path(path)
+        self.dimension = dimension
+        self.row_bytes = dimension * np.dtype(np.float32).itemsize
+        self.path.touch(exist_ok=True)
+        self._file = open(self.path, "r+b")
+        self._map = None
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        """Rows in the file (one past the highest id written)."""
+        return self.path.stat().st_size // self.row_bytes
+
+    def write(self, ids: np.ndarray, vectors: np.ndarray):
+        """Stores `vectors[i]` as the row for `ids[i]`."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if ids[-1] - ids[0] + 1 == len(ids) and (len(ids) == 1 or np.all(np.diff(ids) == 1)):
+                # The common case: a run of freshly assigned ids
+                self._file.seek(int(ids[0]) * self.row_bytes)
+                self._file.write(vectors.tobytes())
+            else:
+                for row_id, row in zip(ids, vectors):
+                    self._file.seek(int(row_id) * self.row_bytes)
+                    self._file.write(row.tobytes())
+            self._file.flush()
+
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        """Rows for `ids` (any shape); returns an array of shape ids.shape + (dim,)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        needed = int(ids.max()) + 1 if ids.size else 0
+        return self._mapping(needed)[ids]
+
+    def _mapping(self, rows: int) -> np.ndarray:
+        mapping = self._map
+        if mapping is None or len(mapping) < rows:
+            with self._lock:
+                mapping = self._map
+                if mapping is None or len(mapping) < rows:
+                    available = self.rows
+                    if available < rows:
+                        raise IndexError(f"Vector store has {available} rows, {rows} needed")
+                    mapping = np.memmap(self.path, dtype=np.float32, mode="r", shape=(available, self.dimension))
+                    self._map = mapping
+        return mapping
+
+    def sync(self):
+        """fsyncs written rows (called before an index snapshot that relies on them)."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def clear(self):
+        with self._lock:
+            # Drop the map before shrinking the file; touching a mapped page past
+            # the end of a file is a bus error
+            self._map = None
+            self._file.truncate(0)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._map = None
+            self._file.close()